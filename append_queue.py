@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from itertools import takewhile
+import threading
+
+from status_watcher import column_letter
+from ticket_index import SHEET_HEADERS, row_from_append_response
+
+logger = logging.getLogger(__name__)
+
+# Baris yang sudah ter-flush disimpan sebentar untuk audit, lalu dibuang
+FLUSHED_RETENTION_SECONDS = 24 * 60 * 60
+
+
+class AppendJournal:
+    """Journal append-only lokal (SQLite WAL) untuk baris yang belum masuk Sheets"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_rows ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " ticket_id TEXT NOT NULL,"
+            " row_values TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " flushed_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_rows_unflushed"
+            " ON pending_rows (id) WHERE flushed_at IS NULL"
+        )
+        self._lock = threading.Lock()
+
+    def append(self, ticket_id, values):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pending_rows (ticket_id, row_values, created_at) VALUES (?, ?, ?)",
+                (ticket_id, json.dumps(values, ensure_ascii=False), time.time())
+            )
+
+    def pending(self, limit=None):
+        """Daftar (id, ticket_id, values) yang belum ter-flush, urut sesuai antrian"""
+        query = "SELECT id, ticket_id, row_values FROM pending_rows WHERE flushed_at IS NULL ORDER BY id"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(row_id, ticket_id, json.loads(values)) for row_id, ticket_id, values in rows]
+
+    def update_value(self, ticket_id, index, value):
+        """Ubah satu nilai di baris tiket yang belum ter-flush; False jika tidak ada"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, row_values FROM pending_rows WHERE ticket_id = ? AND flushed_at IS NULL"
+                " ORDER BY id DESC LIMIT 1",
+                (ticket_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            values = json.loads(row[1])
+            values[index] = value
+            self._conn.execute(
+                "UPDATE pending_rows SET row_values = ? WHERE id = ?",
+                (json.dumps(values, ensure_ascii=False), row[0])
+            )
+        return True
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pending_rows WHERE flushed_at IS NULL"
+            ).fetchone()[0]
+
+    def mark_flushed(self, row_ids):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE pending_rows SET flushed_at = ? WHERE id = ?",
+                [(now, row_id) for row_id in row_ids]
+            )
+            self._conn.execute(
+                "DELETE FROM pending_rows WHERE flushed_at IS NOT NULL AND flushed_at < ?",
+                (now - FLUSHED_RETENTION_SECONDS,)
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AppendQueue:
+    """Write-behind: baris dicatat ke journal, lalu di-flush ke Sheets per batch
+
+    Baris baru ditandai flushed hanya setelah append_rows berhasil, jadi
+    crash atau restart akan mengirim ulang baris yang belum tertulis.
+    append_rows yang gagal (timeout / 5xx) bisa saja sudah tertulis, jadi
+    sebelum kirim ulang kolom Ticket ID dibaca dulu dan baris yang sudah
+    ada di sheet tidak dikirim lagi.
+
+    on_flushed menerima {ticket_id: nomor baris} (None jika tidak diketahui).
+    """
+
+    def __init__(self, journal, sheets, batch_size=20, flush_interval=2.0, on_flushed=None):
+        self.journal = journal
+        self.sheets = sheets
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._append_failed = False  # append terakhir gagal; hasilnya belum pasti
+
+    def enqueue(self, ticket_id, values):
+        """Simpan baris ke journal lokal (durable) dan jadwalkan flush"""
+        self.journal.append(ticket_id, values)
+        if self.journal.pending_count() >= self.batch_size:
+            self._wakeup.set()
+
+    async def update_pending(self, ticket_id, index, value):
+        """Ubah nilai baris yang masih antri; False jika baris sudah masuk sheet"""
+        # Lock flush: baris yang sedang dikirim tidak boleh diubah diam-diam
+        async with self._flush_lock:
+            return self.journal.update_value(ticket_id, index, value)
+
+    async def flush(self):
+        """Kirim semua baris pending ke Sheets; berhenti di batch yang gagal"""
+        async with self._flush_lock:
+            while True:
+                batch = self.journal.pending(self.batch_size)
+                if not batch:
+                    return
+                # Satu append_rows hanya untuk satu worksheet (partisi)
+                partition = self.sheets.partition_for(batch[0][1])
+                batch = list(takewhile(lambda entry: self.sheets.partition_for(entry[1]) == partition, batch))
+                try:
+                    worksheet = await self.sheets.worksheet_for(batch[0][1])
+                    if self._append_failed:
+                        batch = await self._skip_written(batch, worksheet)
+                        self._append_failed = False
+                        if not batch:
+                            continue
+                    rows = [values for _, _, values in batch]
+                    try:
+                        response = await self.sheets.append_rows(rows, target=worksheet)
+                    except Exception:
+                        self._append_failed = True
+                        raise
+                except Exception as e:
+                    logger.error("❌ Failed to flush %s rows to Google Sheets: %s", len(batch), e)
+                    return
+                self.journal.mark_flushed([row_id for row_id, _, _ in batch])
+                logger.info("✅ Flushed %s rows to Google Sheets", len(rows))
+                first_row = row_from_append_response(response)
+                self._notify_flushed({
+                    ticket_id: first_row + offset if first_row is not None else None
+                    for offset, (_, ticket_id, _) in enumerate(batch)
+                })
+
+    async def _skip_written(self, batch, worksheet):
+        """Tandai flushed baris batch yang Ticket ID-nya sudah ada di sheet; sisanya dikembalikan"""
+        column = column_letter(SHEET_HEADERS.index("Ticket ID") + 1)
+        (cells,) = await self.sheets.batch_get([f"{column}2:{column}"], target=worksheet)
+        # Baris data mulai dari baris 2 (baris 1 header)
+        rows_in_sheet = {str(cell[0]).strip(): position + 2 for position, cell in enumerate(cells) if cell}
+        written = [entry for entry in batch if entry[1] in rows_in_sheet]
+        if written:
+            self.journal.mark_flushed([row_id for row_id, _, _ in written])
+            logger.warning("⚠️ %s rows already in sheet after failed append, not resent", len(written))
+            self._notify_flushed({ticket_id: rows_in_sheet[ticket_id] for _, ticket_id, _ in written})
+        return [entry for entry in batch if entry[1] not in rows_in_sheet]
+
+    def _notify_flushed(self, rows):
+        if self.on_flushed:
+            self.on_flushed(rows)
+
+    async def run(self):
+        """Loop flusher: flush saat batch penuh atau setiap flush_interval"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Append queue flush error: {e}")
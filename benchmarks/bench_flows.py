@@ -0,0 +1,247 @@
+"""Benchmark end-to-end alur pengaduan tanpa jaringan
+
+Menjalankan handler asli (handle_message, handle_photo,
+selesaikan_pengaduan, proses_cek_status) dengan Update sintetis, worksheet
+palsu in-process (latency dan jumlah baris bisa diatur) dan Bot palsu yang
+mencatat semua pesan. Hasil: latency p50/p95/p99 per langkah dan jumlah
+alur selesai per detik.
+
+    python benchmarks/bench_flows.py --users 50 --rows 20000 --latency 0.3
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TICKET_PATTERN = re.compile(r"<code>([A-Z]+-\d{8}-\d+)</code>")
+
+
+class FakeWorksheet:
+    """Worksheet gspread palsu dengan latency buatan (dipanggil dari thread pool)"""
+
+    def __init__(self, rows, latency):
+        self.latency = latency
+        self.calls = {}
+        self.records = [
+            {
+                "Timestamp": "01/01/2024 10:00:00",
+                "Ticket ID": f"JB-01012024-{i:05d}",
+                "Nama Website": "JokerBola",
+                "Nama": f"User {i}",
+                "Username Website": f"user{i}",
+                "Keluhan": "Deposit belum masuk",
+                "Bukti": "Tidak ada bukti foto",
+                "Username_TG": f"ID: {i}",
+                "User_ID": 10_000_000 + i,
+                "Contact Method": "User ID",
+                "Full Name Telegram": f"User {i}",
+                "Status": "Selesai",
+            }
+            for i in range(rows)
+        ]
+
+    def _call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep(self.latency)
+
+    def get_all_records(self, **kwargs):
+        self._call("get_all_records")
+        return [dict(row) for row in self.records]
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        first = len(self.records) + 2
+        headers = list(self.records[0].keys()) if self.records else []
+        self.records.extend(dict(zip(headers, row)) for row in values)
+        return {"updates": {"updatedRange": f"Sheet1!A{first}:L{first + len(values) - 1}"}}
+
+    def batch_get(self, ranges, **kwargs):
+        self._call("batch_get")
+        headers = list(self.records[0].keys()) if self.records else []
+        columns = []
+        for a1_range in ranges:
+            # "B2:B" (satu kolom) atau "B5" (satu sel); baris 1 = header, records mulai baris 2
+            letter, first, _, last = re.match(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$", a1_range).groups()
+            column = ord(letter[-1]) - ord("A")
+            first = int(first or 2)
+            last = int(last) if last else (first if ":" not in a1_range else len(self.records) + 1)
+            rows = self.records[max(first, 2) - 2:last - 1]
+            columns.append([[str(row[headers[column]])] for row in rows])
+        return columns
+
+    def update_cell(self, row, col, value):
+        self._call("update_cell")
+        headers = list(self.records[0].keys())
+        self.records[row - 2][headers[col - 1]] = value
+
+
+class FakeBot:
+    """Bot palsu: mencatat semua pesan keluar per chat"""
+
+    defaults = None
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = {}
+        self.total_sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.setdefault(chat_id, []).append(text)
+        self.total_sent += 1
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        await self.send_message(chat_id, f"[foto {photo}] {caption or ''}")
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        photos = ", ".join(item.media for item in media)
+        await self.send_message(chat_id, f"[album {photos}] {media[0].caption or ''}")
+
+    async def get_file(self, file_id, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Seperti Bot API server lokal: file_path berupa path di disk
+        path = os.path.join(tempfile.gettempdir(), f"bench_{file_id}.jpg")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(os.urandom(200 * 1024))
+        return SimpleNamespace(file_id=file_id, file_path=path)
+
+    async def set_my_commands(self, *args, **kwargs):
+        return True
+
+    async def set_chat_menu_button(self, *args, **kwargs):
+        return True
+
+
+def make_update(bot, user_id, message_id, text=None, photo_id=None, media_group_id=None):
+    """Update sintetis berisi pesan text atau foto dari user_id"""
+    from telegram import Update, Message, Chat, User, PhotoSize
+
+    user = User(id=user_id, first_name=f"Bench{user_id}", is_bot=False, username=f"bench{user_id}")
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    photo = None
+    if photo_id:
+        photo = (PhotoSize(file_id=photo_id, file_unique_id=photo_id, width=800, height=600),)
+    message = Message(
+        message_id=message_id, date=datetime.now(), chat=chat, from_user=user, text=text, photo=photo,
+        media_group_id=media_group_id
+    )
+    message.set_bot(bot)
+    return Update(update_id=message_id, message=message)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_flow(bot, user_id, with_photo, timings):
+    import pengaduan_bot as app
+
+    context = SimpleNamespace(bot=bot)
+    counter = iter(range(user_id * 100, user_id * 100 + 100))
+
+    async def step(name, handler, **kwargs):
+        update = make_update(bot, user_id, next(counter), **kwargs)
+        started = time.perf_counter()
+        await handler(update, context)
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+
+    await step("buat_pengaduan", app.handle_message, text="📝 Buat Pengaduan Baru")
+    await step("website", app.handle_message, text="jokerbola")
+    await step("nama", app.handle_message, text=f"Bench User {user_id}")
+    await step("username", app.handle_message, text=f"bench{user_id}")
+    await step("keluhan", app.handle_message, text="Deposit sudah 1 jam belum masuk")
+    if with_photo:
+        await step("bukti_foto", app.handle_photo, photo_id=f"photo{user_id}")
+    else:
+        await step("bukti_lewati", app.handle_message, text="⏩ Lewati Tanpa Foto")
+
+    tickets = TICKET_PATTERN.findall("\n".join(bot.sent.get(user_id, [])))
+    if not tickets:
+        raise RuntimeError(f"No ticket issued for user {user_id}")
+
+    await step("cek_status_menu", app.handle_message, text="🔍 Cek Status Tiket")
+    await step("cek_status", app.handle_message, text=tickets[-1])
+
+
+async def run_benchmark(args):
+    import pengaduan_bot as app
+
+    worksheet = FakeWorksheet(args.rows, args.latency)
+    app.sheets.attach(worksheet)
+    bot = FakeBot(args.bot_latency)
+    application = SimpleNamespace(bot=bot)
+
+    started = time.perf_counter()
+    await app.post_init(application)
+    startup = time.perf_counter() - started
+    while not app.is_ready():
+        await asyncio.sleep(0.01)
+    ready = time.perf_counter() - started
+
+    timings = {}
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_flow(bot, 1_000 + i, i < args.users * args.photo_ratio, timings)
+        for i in range(args.users)
+    ], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = [r for r in results if isinstance(r, Exception)]
+
+    started = time.perf_counter()
+    await app.post_shutdown(application)
+    shutdown = time.perf_counter() - started
+
+    print(f"\nUsers: {args.users}  Sheet rows: {args.rows}  Sheets latency: {args.latency}s")
+    print(f"Startup: {startup:.3f}s  Ready: {ready:.3f}s  Shutdown (final flush): {shutdown:.3f}s")
+    print(f"Completed flows: {args.users - len(failures)}/{args.users} in {elapsed:.3f}s "
+          f"({(args.users - len(failures)) / elapsed:.1f} flows/s)")
+    for failure in failures[:5]:
+        print(f"  ❌ {failure!r}")
+    print(f"\n{'step':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in timings.items():
+        print(f"{name:<18}{len(values):>6}"
+              f"{percentile(values, 50) * 1000:>10.2f}"
+              f"{percentile(values, 95) * 1000:>10.2f}"
+              f"{percentile(values, 99) * 1000:>10.2f}"
+              f"{max(values) * 1000:>10.2f}")
+    print(f"\nSheets calls: {worksheet.calls}")
+    print(f"Bot messages sent: {bot.total_sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Jumlah user paralel (N)")
+    parser.add_argument("--rows", type=int, default=10000, help="Jumlah baris di sheet palsu (M)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Latency tiap panggilan Sheets (detik)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="Latency tiap panggilan Bot API (detik)")
+    parser.add_argument("--photo-ratio", type=float, default=0.3, help="Porsi user yang mengirim foto")
+    args = parser.parse_args()
+
+    # Semua file lokal bot ditulis ke direktori sementara
+    data_dir = tempfile.mkdtemp(prefix="bench_pengaduan_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ.setdefault("SESSION_EXPIRY_NOTIFY", "0")
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import re
+import random
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 61) - 1
+
+
+def shingles(text, size=3):
+    """Shingle karakter dari teks ternormalisasi (lowercase, tanpa tanda baca)"""
+    normalized = " ".join(re.findall(r"[a-z0-9]+", str(text).lower()))
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class DuplicateIndex:
+    """Index MinHash + LSH untuk keluhan yang mirip per (website, user)
+
+    Setiap keluhan diringkas menjadi signature MinHash, lalu dipecah per
+    band; keluhan dengan band yang sama di scope yang sama menjadi kandidat.
+    Lookup hanya membandingkan kandidat, bukan semua tiket.
+    """
+
+    def __init__(self, num_perm=64, bands=32, threshold=0.5, shingle_size=3):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = random.Random(20240101)  # Permutasi tetap agar signature konsisten
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self._entries = {}  # ticket_id -> (scope, signature, day)
+        self._buckets = {}  # (scope, band, nilai band) -> set ticket_id
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signature(self, text):
+        hashes = [_hash(shingle) for shingle in shingles(text, self.shingle_size)]
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, scope, signature):
+        for band in range(self.bands):
+            yield (scope, band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, ticket_id, scope, text, day):
+        """Tambahkan keluhan tiket; day dipakai untuk membatasi jendela waktu"""
+        signature = self.signature(text)
+        if signature is None:
+            return
+        self.remove(ticket_id)
+        self._entries[ticket_id] = (scope, signature, day)
+        for key in self._band_keys(scope, signature):
+            self._buckets.setdefault(key, set()).add(ticket_id)
+
+    def remove(self, ticket_id):
+        entry = self._entries.pop(ticket_id, None)
+        if not entry:
+            return
+        scope, signature, _ = entry
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(ticket_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def find(self, scope, text, since=None):
+        """List (ticket_id, kemiripan) di scope yang sama, urut paling mirip"""
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        candidates = set()
+        for key in self._band_keys(scope, signature):
+            candidates |= self._buckets.get(key, set())
+
+        matches = []
+        for ticket_id in candidates:
+            _, other, day = self._entries[ticket_id]
+            if since is not None and day < since:
+                continue
+            similarity = sum(x == y for x, y in zip(signature, other)) / len(signature)
+            if similarity >= self.threshold:
+                matches.append((ticket_id, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def prune(self, since):
+        """Buang keluhan yang lebih lama dari since"""
+        expired = [ticket_id for ticket_id, (_, _, day) in self._entries.items() if day < since]
+        for ticket_id in expired:
+            self.remove(ticket_id)
+        return len(expired)
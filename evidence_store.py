@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class EvidenceTooLargeError(Exception):
+    """Foto bukti melebihi batas ukuran"""
+
+
+class EvidenceStore:
+    """Penyimpanan foto bukti content-addressed di disk lokal
+
+    Foto di-stream per chunk dari Telegram, disimpan dengan nama sha256
+    isinya, dan dicatat per file_unique_id. Foto yang sama (file_unique_id
+    atau isi sama) hanya diunduh / disimpan sekali. Jika base_url (URL
+    publik root) diset, referensi yang ditulis ke sheet adalah URL stabil,
+    tidak seperti URL download Telegram yang kedaluwarsa.
+    """
+
+    def __init__(self, root, base_url=None, chunk_size=64 * 1024, max_bytes=20 * 1024 * 1024, timeout=60.0):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS evidence ("
+            " file_unique_id TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._inflight = {}  # file_unique_id -> task download
+        self._client = None
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], f"{sha256}.jpg")
+
+    def reference(self, sha256):
+        """URL publik foto untuk kolom Bukti (None jika root tidak di-serve)"""
+        if self.base_url:
+            return f"{self.base_url}/{sha256[:2]}/{sha256}.jpg"
+        return None
+
+    def _lookup(self, file_unique_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM evidence WHERE file_unique_id = ?", (file_unique_id,)
+            ).fetchone()
+        if row and os.path.exists(self.path_for(row[0])):
+            return row[0]
+        return None
+
+    def prefetch(self, bot, file_id, file_unique_id):
+        """Mulai download di background (tidak menunggu); hasilnya dipakai fetch()"""
+        if file_unique_id in self._inflight or self._lookup(file_unique_id):
+            return
+        task = asyncio.get_running_loop().create_task(self._download(bot, file_id, file_unique_id))
+        self._inflight[file_unique_id] = task
+        task.add_done_callback(lambda _: self._inflight.pop(file_unique_id, None))
+
+    async def fetch(self, bot, file_id, file_unique_id):
+        """sha256 foto; download hanya jika foto belum pernah disimpan"""
+        sha256 = self._lookup(file_unique_id)
+        if sha256:
+            return sha256
+        if file_unique_id not in self._inflight:
+            self.prefetch(bot, file_id, file_unique_id)
+        return await asyncio.shield(self._inflight[file_unique_id])
+
+    async def references(self, bot, photos):
+        """Simpan list foto {file_id, file_unique_id} dan kembalikan referensinya
+
+        Foto dirujuk lewat URL publik, atau lewat file_id Telegram (tetap bisa
+        diunduh ulang dengan getFile) jika tidak ada base_url atau foto gagal
+        disimpan.
+        """
+        results = await asyncio.gather(
+            *[self.fetch(bot, photo["file_id"], photo["file_unique_id"]) for photo in photos],
+            return_exceptions=True
+        )
+        references = []
+        for photo, result in zip(photos, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Failed to store evidence {photo['file_unique_id']}: {result}")
+                references.append(f"telegram:{photo['file_id']}")
+            else:
+                references.append(self.reference(result) or f"telegram:{photo['file_id']}")
+        return references
+
+    async def _download(self, bot, file_id, file_unique_id):
+        file_obj = await bot.get_file(file_id)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                async for chunk in self._chunks(file_obj.file_path):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise EvidenceTooLargeError(f"{file_unique_id} exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    out.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256)
+            if os.path.exists(path):
+                # Isi sama dengan foto lain yang sudah tersimpan
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO evidence (file_unique_id, sha256, size, created_at) VALUES (?, ?, ?, ?)",
+                (file_unique_id, sha256, size, time.time())
+            )
+        logger.info("📎 Evidence stored: %s -> %.12s (%s bytes)", file_unique_id, sha256, size)
+        return sha256
+
+    async def _chunks(self, file_path):
+        if not str(file_path).startswith(("http://", "https://")):
+            # Bot API server lokal: file_path adalah path di disk
+            with open(file_path, "rb") as source:
+                while chunk := source.read(self.chunk_size):
+                    yield chunk
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        async with self._client.stream("GET", file_path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                yield chunk
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Jumlah status job yang disimpan untuk pelacakan
+STATUS_HISTORY_LIMIT = 1000
+
+
+class FinalizationPipeline:
+    """Antrian job finalisasi pengaduan dengan worker task sendiri
+
+    Tiket sudah tersimpan sebelum job di-submit; worker hanya mengerjakan
+    bagian yang lambat dan boleh hilang saat crash (download foto bukti).
+    Status tiap job (queued / running / done / failed) bisa dilihat lewat
+    status().
+    """
+
+    def __init__(self, process, workers=2, max_queue=1000):
+        self.process = process
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+        self._status = OrderedDict()
+
+    def _set_status(self, job_id, status):
+        self._status[job_id] = status
+        self._status.move_to_end(job_id)
+        while len(self._status) > STATUS_HISTORY_LIMIT:
+            self._status.popitem(last=False)
+
+    def start(self):
+        for number in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(number)))
+
+    async def submit(self, job_id, job):
+        self._set_status(job_id, "queued")
+        await self._queue.put((job_id, job))
+
+    def status(self, job_id):
+        return self._status.get(job_id)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    async def _worker(self, number):
+        while True:
+            job_id, job = await self._queue.get()
+            self._set_status(job_id, "running")
+            try:
+                await self.process(job_id, job)
+                self._set_status(job_id, "done")
+            except Exception as e:
+                self._set_status(job_id, "failed")
+                logger.error(f"❌ Finalization job {job_id} failed on worker {number}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, timeout=10.0):
+        """Tunggu antrian habis (maks timeout) lalu hentikan worker"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Finalization queue not drained, {self.depth()} jobs left")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
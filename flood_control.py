@@ -0,0 +1,57 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UserRateLimiter:
+    """Token bucket per user yang menolak (bukan menunggu) update berlebih
+
+    Tiap user punya capacity token yang terisi rate token per detik; satu
+    update memakai satu token. Foto kedua dan seterusnya dalam satu album
+    (media_group_id sama) tidak dihitung. Bucket yang sudah penuh dan idle
+    dibuang berkala agar memori tidak tumbuh dengan jumlah user.
+    """
+
+    def __init__(self, rate, capacity, idle_ttl=600.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self._buckets = {}  # user_id -> [tokens, updated, sudah diperingatkan, media_group_id terakhir]
+        self._last_prune = time.monotonic()
+
+    def check(self, user_id, media_group_id=None):
+        """(diizinkan, perlu_peringatan); peringatan hanya sekali per periode penolakan"""
+        now = time.monotonic()
+        self._prune(now)
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.capacity, now, False, None]
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if media_group_id and media_group_id == bucket[3]:
+            return True, False
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            bucket[3] = media_group_id
+            return True, False
+
+        warn = not bucket[2]
+        bucket[2] = True
+        if warn:
+            logger.warning("⚠️ Flood control: dropping updates from user %s", user_id)
+        return False, warn
+
+    def _prune(self, now):
+        if now - self._last_prune < self.idle_ttl:
+            return
+        self._last_prune = now
+        for user_id, bucket in list(self._buckets.items()):
+            if now - bucket[1] > self.idle_ttl:
+                del self._buckets[user_id]
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,169 @@
+import re
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import metrics
+
+# Atribut standar LogRecord; sisanya dianggap field dari extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# Pola yang selalu disamarkan: token bot di URL Bot API, nomor telepon / rekening
+DEFAULT_REDACT_PATTERNS = (
+    (re.compile(r"bot\d+:[\w-]+"), "bot<redacted>"),
+    (re.compile(r"(?<!\d)(?:\+?62|0)8\d{7,12}(?!\d)"), "<phone>"),
+)
+DEFAULT_REDACT_FIELDS = frozenset({"text", "keluhan", "user_message", "kontak", "phone", "token"})
+
+
+def parse_sample_rates(spec):
+    """'httpx=0.01,telegram.ext=0.1' -> {'httpx': 0.01, 'telegram.ext': 0.1}"""
+    rates = {}
+    for item in (spec or "").split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris; field dari extra= ikut ditulis"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Loloskan hanya sebagian record di bawah WARNING, rate per logger
+
+    Rate dicari dari nama logger terdekat (telegram.ext.Application ikut
+    rate 'telegram'); WARNING ke atas selalu lolos.
+    """
+
+    def __init__(self, rates, max_level=logging.INFO):
+        super().__init__()
+        self.rates = dict(rates)
+        self.max_level = max_level
+        self._cache = {}
+
+    def _rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        metrics.LOG_DROPPED.inc("sampled")
+        return False
+
+
+class RedactingFilter(logging.Filter):
+    """Samarkan pola sensitif di pesan / traceback dan field extra sensitif"""
+
+    def __init__(self, patterns=DEFAULT_REDACT_PATTERNS, fields=DEFAULT_REDACT_FIELDS):
+        super().__init__()
+        self.patterns = patterns
+        self.fields = fields
+
+    def _scrub(self, text):
+        for pattern, replacement in self.patterns:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def filter(self, record):
+        record.msg = self._scrub(record.getMessage())
+        record.args = None
+        if record.exc_text:
+            record.exc_text = self._scrub(record.exc_text)
+        for field in self.fields & record.__dict__.keys():
+            value = record.__dict__[field]
+            record.__dict__[field] = f"<redacted len={len(str(value))}>"
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler yang membuang record (dan menghitungnya) saat antrian penuh"""
+
+    def prepare(self, record):
+        # Cukup render pesan; format lengkap (JSON) dikerjakan thread listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_DROPPED.inc("queue_full")
+
+
+class _LogListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Blocking: antrian bisa penuh saat exit, listener tetap mengosongkannya
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(level=logging.INFO, json_output=True, sample_rates=None, queue_size=10000):
+    """Pasang logging async: handler antrian di root, I/O di thread listener
+
+    Handler I/O (stream ke stdout/stderr) hanya dijalankan thread listener,
+    jadi event loop cukup memasukkan record ke antrian.
+    """
+    stream = logging.StreamHandler()
+    if json_output:
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    stream.addFilter(RedactingFilter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = _LogListener(handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    # Kosongkan antrian saat proses keluar agar log terakhir tidak hilang
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,205 @@
+import time
+import asyncio
+import logging
+from functools import partial
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge; nilai diset langsung atau dibaca dari callback saat render"""
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        _registry.append(self)
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def render(self):
+        values = dict(self._values)
+        if self.callback:
+            try:
+                result = self.callback()
+                if isinstance(result, dict):
+                    values.update({(key,): value for key, value in result.items()})
+                else:
+                    values[()] = result
+            except Exception as e:
+                logger.warning(f"⚠️ Gauge {self.name} callback failed: {e}")
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def labels(self):
+        """Semua kombinasi label yang sudah punya observasi"""
+        return sorted(self._series)
+
+    def summary(self, *labels):
+        """(count, rata-rata) untuk satu seri label"""
+        series = self._series.get(labels)
+        if not series or not series[-1]:
+            return 0, 0.0
+        return series[-1], series[-2] / series[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+def render():
+    """Semua metrik dalam format teks Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== METRIK BOT =====
+HANDLER_LATENCY = Histogram(
+    "pengaduan_handler_latency_seconds", "Latency handler Telegram", ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "pengaduan_handler_errors_total", "Exception yang keluar dari handler", ["handler"]
+)
+SHEETS_CALLS = Counter(
+    "pengaduan_sheets_calls_total", "Jumlah panggilan Google Sheets", ["method", "result"]
+)
+SHEETS_DURATION = Histogram(
+    "pengaduan_sheets_call_duration_seconds", "Durasi panggilan Google Sheets", ["method"]
+)
+SHEETS_RETRIES = Counter(
+    "pengaduan_sheets_retries_total", "Panggilan Google Sheets yang diulang (backoff)", ["method"]
+)
+SHEETS_THROTTLED = Counter(
+    "pengaduan_sheets_throttled_total", "Error kuota 429 dari Google Sheets", ["method"]
+)
+SHEETS_COALESCED = Counter(
+    "pengaduan_sheets_coalesced_total", "Read identik yang digabung ke request yang sedang berjalan", ["method"]
+)
+SHEETS_QUOTA = Gauge(
+    "pengaduan_sheets_quota", "Pemakaian kuota Google Sheets dan status circuit breaker", ["kind"]
+)
+FLOOD_REJECTED = Counter(
+    "pengaduan_flood_rejected_total", "Update yang ditolak flood control per user"
+)
+NOTIFICATIONS = Counter(
+    "pengaduan_notifications_total", "Hasil pengiriman notifikasi admin", ["result"]
+)
+SESSIONS = Gauge(
+    "pengaduan_sessions", "Jumlah session user", ["kind"]
+)
+QUEUE_DEPTH = Gauge(
+    "pengaduan_queue_depth", "Kedalaman antrian internal", ["queue"]
+)
+LOG_DROPPED = Counter(
+    "pengaduan_log_dropped_total", "Record log yang dibuang (sampling / antrian penuh)", ["reason"]
+)
+READINESS = Gauge(
+    "pengaduan_ready", "Status startup per komponen (1 = siap)", ["component"]
+)
+
+
+async def _handle_http(reader, writer, ready=None):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Buang header request
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) >= 2 and parts[0] == "GET" else None
+        if path == "/metrics":
+            status, body = "200 OK", render().encode("utf-8")
+        elif path == "/ready" and ready is not None:
+            status, body = ("200 OK", b"ready\n") if ready() else ("503 Service Unavailable", b"starting\n")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.warning(f"⚠️ Metrics request failed: {e}")
+    finally:
+        writer.close()
+
+
+async def start_http_server(port, host="0.0.0.0", ready=None):
+    """Endpoint GET /metrics untuk Prometheus, dan GET /ready jika ready (callable) diberikan"""
+    server = await asyncio.start_server(partial(_handle_http, ready=ready), host, port)
+    logger.info(f"📈 Metrics endpoint listening on {host}:{port}/metrics")
+    return server
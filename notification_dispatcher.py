@@ -0,0 +1,121 @@
+import time
+import asyncio
+import logging
+
+from telegram import InputMediaPhoto
+from telegram.error import RetryAfter, Forbidden, BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket async: rate token per detik, maksimal capacity token"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _retry_after_seconds(error):
+    delay = error.retry_after
+    return delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+
+
+class NotificationDispatcher:
+    """Kirim satu pesan ke banyak chat secara paralel sesuai limit Telegram
+
+    Memakai token bucket global dan per chat, mematuhi RetryAfter, dan
+    hanya mengulang penerima yang gagal.
+    """
+
+    def __init__(self, global_rate=25, per_chat_rate=1.0, retry_delay=2.0):
+        self.retry_delay = retry_delay
+        self.per_chat_rate = per_chat_rate
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, capacity=1)
+        return self._chat_buckets[chat_id]
+
+    async def _send_photos(self, bot, chat_id, caption, photos, parse_mode=None, **kwargs):
+        """Kirim foto (file_id) dengan caption di foto pertama; album maks 10 foto"""
+        for start in range(0, len(photos), 10):
+            chunk = photos[start:start + 10]
+            chunk_caption = caption if start == 0 else None
+            if len(chunk) == 1:
+                await bot.send_photo(chat_id=chat_id, photo=chunk[0], caption=chunk_caption, parse_mode=parse_mode)
+                continue
+            await bot.send_media_group(chat_id=chat_id, media=[
+                InputMediaPhoto(photo, caption=chunk_caption if index == 0 else None, parse_mode=parse_mode)
+                for index, photo in enumerate(chunk)
+            ])
+
+    async def _send_one(self, bot, chat_id, text, max_retry_after, photos=None, **kwargs):
+        """Kirim ke satu chat; True jika berhasil, None jika gagal permanen"""
+        while True:
+            await self._chat_bucket(chat_id).acquire()
+            await self._global_bucket.acquire()
+            try:
+                if photos:
+                    await self._send_photos(bot, chat_id, text, photos, **kwargs)
+                else:
+                    await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                return True
+            except RetryAfter as e:
+                delay = _retry_after_seconds(e)
+                if delay > max_retry_after:
+                    logger.warning("⚠️ RetryAfter %ss for chat %s exceeds limit", delay, chat_id)
+                    return False
+                logger.warning("⏳ Flood control for chat %s, retrying in %ss", chat_id, delay)
+                await asyncio.sleep(delay)
+            except (Forbidden, BadRequest) as e:
+                logger.error("❌ Permanent failure sending to %s: %s", chat_id, e)
+                return None
+            except Exception as e:
+                logger.error("❌ Failed to send to %s: %s", chat_id, e)
+                return False
+
+    async def send(self, bot, chat_ids, text, attempts=3, max_retry_after=60, photos=None, **kwargs):
+        """Kirim text (atau foto dengan text sebagai caption) ke semua chat_ids
+
+        Mengembalikan {chat_id: hasil}: True berhasil, False gagal (boleh
+        diulang), None gagal permanen.
+        """
+        results = {chat_id: False for chat_id in chat_ids}
+        pending = list(chat_ids)
+        for attempt in range(attempts):
+            outcomes = await asyncio.gather(*[
+                self._send_one(bot, chat_id, text, max_retry_after, photos, **kwargs)
+                for chat_id in pending
+            ])
+            retry = []
+            for chat_id, outcome in zip(pending, outcomes):
+                results[chat_id] = outcome
+                if outcome is False:
+                    retry.append(chat_id)
+            pending = retry
+            if not pending:
+                break
+            if attempt < attempts - 1:
+                logger.warning("⚠️ Retrying %s recipients, attempt %s/%s", len(pending), attempt + 2, attempts)
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+        return results
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from itertools import groupby
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Pengiriman yang sudah selesai (sent / failed) disimpan sebentar untuk audit dan dedup, lalu dibuang
+DONE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+class NotificationOutbox:
+    """Outbox notifikasi yang persisten di SQLite
+
+    Setiap pengiriman (ticket_id, chat_id) dicatat sekali (dedup lewat
+    key unik), lalu dikirim worker di background dengan backoff
+    eksponensial. Pengiriman yang tertunda tetap ada setelah restart.
+    """
+
+    def __init__(self, path, dispatcher, max_attempts=10, base_delay=2.0, max_delay=600.0, batch_size=50):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.dispatcher = dispatcher
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " dedup_key TEXT NOT NULL UNIQUE,"
+            " ticket_id TEXT NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " sent_at REAL,"
+            " last_error TEXT,"
+            " photos TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "photos" not in columns:
+            # Database lama: kolom file_id foto (JSON) untuk notifikasi bukti
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN photos TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_done ON outbox (status, sent_at)"
+        )
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._last_purge = 0.0
+
+    def enqueue(self, ticket_id, chat_ids, text, event=None, photos=None):
+        """Catat pengiriman ke setiap chat; duplikat (ticket_id, event, chat_id) diabaikan
+
+        Jika photos (list file_id) diberikan, yang dikirim adalah foto dengan
+        text sebagai caption.
+        """
+        now = time.time()
+        prefix = f"{ticket_id}:{event}" if event else ticket_id
+        photos = json.dumps(list(photos)) if photos else None
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO outbox"
+                " (dedup_key, ticket_id, chat_id, text, photos, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(f"{prefix}:{chat_id}", ticket_id, chat_id, text, photos, now, now) for chat_id in chat_ids]
+            )
+        self._wakeup.set()
+        return cursor.rowcount
+
+    def _due(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, chat_id, text, attempts, photos FROM outbox"
+                " WHERE status = 'pending' AND next_attempt_at <= ?"
+                " ORDER BY text, photos, id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+
+    def _record(self, row_id, attempts, outcome):
+        now = time.time()
+        with self._lock:
+            if outcome:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ? WHERE id = ?",
+                    (attempts, now, row_id)
+                )
+            elif outcome is None or attempts >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, "permanent" if outcome is None else "max attempts", row_id)
+                )
+            else:
+                delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+                self._conn.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + delay, "send failed", row_id)
+                )
+
+    async def drain(self, bot):
+        """Kirim semua pengiriman yang sudah jatuh tempo; pesan yang sama dikirim paralel"""
+        sent = 0
+        while True:
+            due = self._due()
+            if not due:
+                return sent
+            for (text, photos), rows in groupby(due, key=lambda row: (row[2], row[4])):
+                rows = list(rows)
+                results = await self.dispatcher.send(bot, [row[1] for row in rows], text, attempts=1,
+                                                     photos=json.loads(photos) if photos else None,
+                                                     parse_mode="HTML", disable_web_page_preview=True)
+                for row_id, chat_id, _, attempts, _ in rows:
+                    outcome = results.get(chat_id)
+                    self._record(row_id, attempts + 1, outcome)
+                    metrics.NOTIFICATIONS.inc("sent" if outcome else "permanent" if outcome is None else "failed")
+                    sent += 1 if outcome else 0
+
+    def purge(self, retention=DONE_RETENTION_SECONDS):
+        """Hapus pengiriman sent / failed yang lebih lama dari retention detik"""
+        cutoff = time.time() - retention
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM outbox WHERE (status = 'sent' AND sent_at < ?)"
+                " OR (status = 'failed' AND created_at < ?)",
+                (cutoff, cutoff)
+            )
+        if cursor.rowcount:
+            logger.info(f"🧹 Outbox purged {cursor.rowcount} old deliveries")
+        return cursor.rowcount
+
+    async def run(self, bot, poll_interval=5.0):
+        """Worker outbox: kirim saat ada item baru atau setiap poll_interval"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.drain(bot)
+                if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                    self._last_purge = time.monotonic()
+                    self.purge()
+            except Exception as e:
+                logger.error(f"❌ Outbox drain failed: {e}")
+
+    def stats(self):
+        """Kedalaman outbox dan lag pengiriman (detik)"""
+        now = time.time()
+        with self._lock:
+            pending, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+            failed = self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'failed'"
+            ).fetchone()[0]
+            avg_lag = self._conn.execute(
+                "SELECT AVG(sent_at - created_at) FROM"
+                " (SELECT sent_at, created_at FROM outbox WHERE status = 'sent' ORDER BY sent_at DESC LIMIT 100)"
+            ).fetchone()[0]
+        return {
+            "pending": pending,
+            "failed": failed,
+            "oldest_pending_age": (now - oldest) if oldest else 0.0,
+            "avg_delivery_lag": avg_lag or 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -4,18 +4,42 @@ import gspread
 import logging
 import pytz
 import asyncio
-from datetime import datetime
+import time
+import random
+import socket
+import functools
+from datetime import datetime, timedelta
 from telegram import Update, MenuButtonCommands, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, ContextTypes,
     filters
 )
+from ticket_index import TicketIndex
+from ticket_counter import TicketCounter, RedisTicketCounter, parse_ticket_id
+from sheets_gateway import SheetsGateway
+from sheet_partitions import PartitionedSheetsGateway
+from append_queue import AppendJournal, AppendQueue
+from storage import SQLiteTicketStorage, SheetMirror, CLOSED_STATUSES
+from status_watcher import StatusWatcher
+from evidence_store import EvidenceStore
+from flood_control import UserRateLimiter
+from duplicate_index import DuplicateIndex
+from session_store import SessionStore
+from session_backend import MemorySessionBackend, RedisSessionBackend, create_redis_backend
+from finalization import FinalizationPipeline
+from notification_dispatcher import NotificationDispatcher
+from notification_outbox import NotificationOutbox
+from update_processor import PerUserUpdateProcessor
+from website_registry import WebsiteRegistry, load_websites
+import metrics
+from log_setup import setup_logging, parse_sample_rates
 
-# Setup logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Logging: handler antrian + thread listener, output JSON (LOG_FORMAT=text untuk dev)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+# Sampling per logger untuk log di bawah WARNING, mis. "httpx=0.01,pengaduan_bot=0.1"
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "httpx=0.01"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
 logger = logging.getLogger(__name__)
 
 # Config
@@ -23,28 +47,141 @@ BOT_TOKEN = os.environ.get("BOT_TOKEN")
 GOOGLE_CREDENTIALS_JSON = os.environ.get("GOOGLE_CREDENTIALS")
 GOOGLE_SHEET_NAME = "Pengaduan Global"
 ADMIN_IDS = [5704050846, 8388423519]
+# Resync penuh hanya untuk baris yang ditambah manual; perubahan Status dipantau StatusWatcher
+TICKET_INDEX_RESYNC_SECONDS = int(os.environ.get("TICKET_INDEX_RESYNC_SECONDS", "1800"))
+STATUS_WATCH_INTERVAL = float(os.environ.get("STATUS_WATCH_INTERVAL", "60"))  # 0 = nonaktif
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+TICKET_COUNTER_FILE = os.environ.get("TICKET_COUNTER_FILE", os.path.join(DATA_DIR, "ticket_counter.json"))
+EVIDENCE_DIR = os.environ.get("EVIDENCE_DIR", os.path.join(DATA_DIR, "evidence"))
+# URL publik EVIDENCE_DIR; kosong = foto tidak diunduh, Bukti berisi file_id Telegram
+EVIDENCE_BASE_URL = os.environ.get("EVIDENCE_BASE_URL")
+EVIDENCE_ALBUM_WAIT = float(os.environ.get("EVIDENCE_ALBUM_WAIT", "1.5"))  # Tunggu foto album lain
+SHEETS_MAX_CONCURRENCY = int(os.environ.get("SHEETS_MAX_CONCURRENCY", "4"))
+SHEETS_CALL_TIMEOUT = float(os.environ.get("SHEETS_CALL_TIMEOUT", "30"))
+SHEETS_MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", "4"))          # Retry 429 / 5xx dengan backoff
+SHEETS_BREAKER_THRESHOLD = int(os.environ.get("SHEETS_BREAKER_THRESHOLD", "5"))  # Gagal beruntun sebelum circuit terbuka
+SHEETS_BREAKER_COOLDOWN = float(os.environ.get("SHEETS_BREAKER_COOLDOWN", "60"))
+SHEETS_READ_QUOTA = int(os.environ.get("SHEETS_READ_QUOTA", "60"))    # Read request per menit; 0 = tanpa batas
+SHEETS_WRITE_QUOTA = int(os.environ.get("SHEETS_WRITE_QUOTA", "60"))  # Write request per menit; 0 = tanpa batas
+# Worksheet per bulan mulai SHEET_PARTITION_START (YYYY-MM); kosong = semua di sheet1
+SHEET_PARTITION_START = os.environ.get("SHEET_PARTITION_START")
+SHEET_HOT_PARTITIONS = int(os.environ.get("SHEET_HOT_PARTITIONS", "2"))
+APPEND_JOURNAL_FILE = os.environ.get("APPEND_JOURNAL_FILE", os.path.join(DATA_DIR, "append_journal.db"))
+APPEND_BATCH_SIZE = int(os.environ.get("APPEND_BATCH_SIZE", "20"))
+APPEND_FLUSH_INTERVAL = float(os.environ.get("APPEND_FLUSH_INTERVAL", "2"))
+STORAGE_FILE = os.environ.get("STORAGE_FILE", os.path.join(DATA_DIR, "tickets.db"))
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", "1800"))
+SESSION_SWEEP_INTERVAL = int(os.environ.get("SESSION_SWEEP_INTERVAL", "60"))
+SESSION_EXPIRY_NOTIFY = os.environ.get("SESSION_EXPIRY_NOTIFY", "1") == "1"
+SESSION_STORE_FILE = os.environ.get("SESSION_STORE_FILE", os.path.join(DATA_DIR, "sessions.db"))
+SESSION_PERSIST_DEBOUNCE = float(os.environ.get("SESSION_PERSIST_DEBOUNCE", "2"))
+DROP_PENDING_UPDATES = os.environ.get("DROP_PENDING_UPDATES", "0") == "1"
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")  # memory | redis
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+# Dengan backend redis beberapa worker webhook boleh jalan (counter tiket di Redis);
+# notifikasi perubahan status hanya dikirim worker yang memegang lease ini
+INSTANCE_LEASE_SECONDS = int(os.environ.get("INSTANCE_LEASE_SECONDS", "30"))
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+FINALIZE_WORKERS = int(os.environ.get("FINALIZE_WORKERS", "2"))
+NOTIFY_GLOBAL_RATE = float(os.environ.get("NOTIFY_GLOBAL_RATE", "25"))
+NOTIFY_PER_CHAT_RATE = float(os.environ.get("NOTIFY_PER_CHAT_RATE", "1"))
+NOTIFICATION_OUTBOX_FILE = os.environ.get("NOTIFICATION_OUTBOX_FILE", os.path.join(DATA_DIR, "outbox.db"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Mode update: "polling" (development) atau "webhook" (production)
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")  # URL publik, tanpa path
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+# Untuk testing dengan server Telegram palsu lokal (tools/fake_telegram.py)
+TELEGRAM_API_BASE_URL = os.environ.get("TELEGRAM_API_BASE_URL")
+# Bot hanya menangani pesan (text, foto, command)
+ALLOWED_UPDATES = [Update.MESSAGE]
+UPDATE_CONCURRENCY = int(os.environ.get("UPDATE_CONCURRENCY", "64"))
+UPDATE_USER_QUEUE_DEPTH = int(os.environ.get("UPDATE_USER_QUEUE_DEPTH", "20"))
+FLOOD_RATE = float(os.environ.get("FLOOD_RATE", "0.5"))      # Pesan per detik per user (rata-rata)
+FLOOD_BURST = int(os.environ.get("FLOOD_BURST", "10"))       # Pesan beruntun yang masih diterima
+DAILY_TICKET_CAP = int(os.environ.get("DAILY_TICKET_CAP", "5"))  # Tiket per user per hari; 0 = tanpa batas
+DUPLICATE_WINDOW_DAYS = int(os.environ.get("DUPLICATE_WINDOW_DAYS", "7"))  # 0 = cek duplikat nonaktif
+RECENT_TICKETS_SHOWN = int(os.environ.get("RECENT_TICKETS_SHOWN", "5"))  # Tiket user di menu cek status
+DUPLICATE_THRESHOLD = float(os.environ.get("DUPLICATE_THRESHOLD", "0.5"))  # Kemiripan keluhan (0-1)
+METRICS_PORT = os.environ.get("METRICS_PORT")  # Endpoint Prometheus dimatikan jika kosong
 
 # Timezone Jakarta
 JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
 
 # Website configuration - HANYA INI YANG DITERIMA
-WEBSITES = {
+# Bisa diganti lewat file JSON di WEBSITES_FILE (format sama, boleh tambah "aliases")
+WEBSITES_FILE = os.environ.get("WEBSITES_FILE", "websites.json")
+WEBSITES = load_websites(WEBSITES_FILE, {
     'jokerbola': {'code': 'JB', 'name': 'JokerBola'},
     'nagabola': {'code': 'NB', 'name': 'NagaBola'}, 
     'macanbola': {'code': 'MB', 'name': 'MacanBola'},
     'ligapedia': {'code': 'LP', 'name': 'LigaPedia'},
     'pasarliga': {'code': 'PL', 'name': 'PasarLiga'}
-}
+})
+# Index alias dibangun sekali saat startup
+website_registry = WebsiteRegistry(WEBSITES)
 
-# Setup Google Sheets
-try:
+# Setup Google Sheets: koneksi dibuka saat startup (warm_up), bukan saat import
+def open_spreadsheet():
+    """Autentikasi gspread dan buka spreadsheet (blocking, jalankan di thread)"""
     gc = gspread.service_account_from_dict(json.loads(GOOGLE_CREDENTIALS_JSON))
     sh = gc.open(GOOGLE_SHEET_NAME)
-    worksheet = sh.sheet1
+    return sh, sh.sheet1
+
+async def connect_sheets():
+    """Hubungkan gateway ke spreadsheet"""
+    if not GOOGLE_CREDENTIALS_JSON:
+        raise RuntimeError("GOOGLE_CREDENTIALS not set")
+    sh, worksheet = await asyncio.wait_for(asyncio.to_thread(open_spreadsheet), SHEETS_CALL_TIMEOUT)
+    sheets.attach(worksheet, sh)
     logger.info("✅ Google Sheets connected successfully")
-except Exception as e:
-    logger.error(f"❌ Google Sheets connection failed: {e}")
-    worksheet = None
+
+# Semua akses gspread lewat gateway agar tidak memblokir event loop dan menjaga kuota
+SHEETS_OPTIONS = dict(
+    max_concurrency=SHEETS_MAX_CONCURRENCY,
+    timeout=SHEETS_CALL_TIMEOUT,
+    max_retries=SHEETS_MAX_RETRIES,
+    breaker_threshold=SHEETS_BREAKER_THRESHOLD,
+    breaker_cooldown=SHEETS_BREAKER_COOLDOWN,
+    read_quota=SHEETS_READ_QUOTA,
+    write_quota=SHEETS_WRITE_QUOTA
+)
+if SHEET_PARTITION_START:
+    # sheet1 tetap menyimpan tiket sebelum SHEET_PARTITION_START
+    sheets = PartitionedSheetsGateway(
+        None, None, SHEET_PARTITION_START,
+        hot_months=SHEET_HOT_PARTITIONS,
+        timezone=JAKARTA_TZ,
+        **SHEETS_OPTIONS
+    )
+else:
+    sheets = SheetsGateway(None, **SHEETS_OPTIONS)
+
+# Index baris sheet (Ticket ID -> nomor baris) untuk mirror ke Google Sheets
+ticket_index = TicketIndex()
+background_tasks = []
+
+def on_rows_flushed(rows):
+    """Catat nomor baris tiket setelah batch masuk ke sheet"""
+    for ticket_id, row_number in rows.items():
+        if row_number is not None:
+            ticket_index.set_row_number(ticket_id, row_number)
+
+# Write-behind: pengaduan dicatat ke journal lokal lalu di-flush per batch
+append_queue = AppendQueue(
+    AppendJournal(APPEND_JOURNAL_FILE),
+    sheets,
+    batch_size=APPEND_BATCH_SIZE,
+    flush_interval=APPEND_FLUSH_INTERVAL,
+    on_flushed=on_rows_flushed
+)
+
+# SQLite lokal sebagai sumber data utama; sheet menjadi mirror untuk admin
+storage = SheetMirror(SQLiteTicketStorage(STORAGE_FILE), sheets, append_queue, ticket_index)
 
 # ===== KEYBOARD SETUP =====
 def get_main_menu_keyboard():
@@ -68,39 +205,38 @@ def get_skip_photo_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, input_field_placeholder="Pilih opsi...")
 
+def get_duplicate_keyboard():
+    """Keyboard konfirmasi pengaduan yang mirip tiket lama"""
+    keyboard = [
+        [KeyboardButton("🔗 Gabungkan ke Tiket Lama"), KeyboardButton("🆕 Buat Tiket Baru")],
+        [KeyboardButton("❌ Batalkan Proses")]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, input_field_placeholder="Pilih opsi...")
+
 # Helper functions
 def get_jakarta_time():
     """Dapatkan waktu Jakarta sekarang"""
     return datetime.now(JAKARTA_TZ).strftime("%d/%m/%Y %H:%M:%S")
 
-def generate_ticket_number(website_code):
-    """Generate ticket number berdasarkan kode website"""
-    try:
-        all_data = worksheet.get_all_records()
-        today = datetime.now(JAKARTA_TZ).strftime("%d%m%Y")  # DDMMYYYY
-        
-        # Hitung tiket hari ini untuk website tertentu
-        count_today = sum(1 for row in all_data 
-                         if str(row.get('Ticket ID', '')).startswith(f"{website_code}-{today}"))
-        
-        return f"{website_code}-{today}-{count_today+1:03d}"
-    except Exception as e:
-        logger.error(f"Error generating ticket: {e}")
-        return f"{website_code}-{datetime.now(JAKARTA_TZ).strftime('%d%m%Y')}-001"
+async def generate_ticket_number(website_code):
+    """Generate ticket number berdasarkan kode website
 
-def validate_website_input(user_input):
-    """Validasi input website customer - HARUS SESUAI KRITERIA"""
-    user_input_lower = user_input.lower().strip()
-    
-    # Cek apakah input user cocok dengan website yang ada
-    for key, info in WEBSITES.items():
-        if (key in user_input_lower or 
-            info['name'].lower() in user_input_lower or
-            user_input_lower in key or 
-            user_input_lower in info['name'].lower()):
-            return info['name'], info['code']
+    Hanya setelah counter di-seed dari sheet: storage lokal bisa kosong
+    (DATA_DIR baru) sehingga nomor yang sudah ada di sheet terpakai ulang.
+    """
+    if not ticket_counter.seeded:
+        raise RuntimeError("Ticket counter not seeded from sheet yet")
+    today = datetime.now(JAKARTA_TZ).strftime("%d%m%Y")  # DDMMYYYY
     
-    return None, None
+    number = await ticket_counter.next_number(website_code, today)
+    return f"{website_code}-{today}-{number:03d}"
+
+def validate_website_input(user_input):
+    """Validasi input website customer - HARUS SESUAI KRITERIA
+
+    Mengembalikan WebsiteMatch dengan status ok / ambiguous / none.
+    """
+    return website_registry.match(user_input)
 
 def escape_html(text):
     """Escape karakter khusus HTML"""
@@ -144,37 +280,110 @@ def get_user_contact_info(user):
     }
 
 # ===== STATE MANAGEMENT YANG DIPERBAIKI =====
-user_states = {}
-user_locks = {}  # Lock untuk setiap user
+def create_session_backend():
+    """Backend state sesuai SESSION_BACKEND: memory (file lokal) atau redis (state di Redis, multi worker)"""
+    if SESSION_BACKEND == "redis":
+        return create_redis_backend(REDIS_URL, SESSION_TTL_SECONDS)
+    # State disimpan ke disk agar restart tidak memutus proses user
+    return MemorySessionBackend(SessionStore(SESSION_STORE_FILE))
+
+session_backend = create_session_backend()
+
+# Counter tiket harian: file lokal untuk satu worker, Redis INCR jika state di Redis
+if isinstance(session_backend, RedisSessionBackend):
+    ticket_counter = RedisTicketCounter(session_backend.client)
+else:
+    ticket_counter = TicketCounter(TICKET_COUNTER_FILE)
+
+# Storage, journal dan outbox tetap lokal per worker; yang tidak boleh dobel
+# hanya notifikasi perubahan status dari sheet (dibaca semua worker)
+instance_lease = {"held": False}
+
+async def claim_instance_lease():
+    """Klaim / perpanjang lease notifikasi status; False jika dipegang worker lain"""
+    try:
+        held = await session_backend.claim_instance(INSTANCE_ID, INSTANCE_LEASE_SECONDS)
+    except Exception as e:
+        logger.error(f"❌ Instance lease renewal failed: {e}")
+        held = False
+    if held != instance_lease["held"]:
+        logger.info(f"🔑 Status notifier lease {'acquired' if held else 'lost'} ({INSTANCE_ID})")
+    instance_lease["held"] = held
+    return held
+
+async def instance_lease_loop():
+    """Perpanjang lease berkala; worker lain mengambil alih jika worker ini berhenti"""
+    while True:
+        await asyncio.sleep(INSTANCE_LEASE_SECONDS / 3)
+        await claim_instance_lease()
 
 def get_user_lock(user_id):
     """Dapatkan lock untuk user tertentu"""
-    if user_id not in user_locks:
-        user_locks[user_id] = asyncio.Lock()
-    return user_locks[user_id]
-
-def get_user_state(user_id):
-    """Dapatkan state user dengan default values - THREAD SAFE"""
-    if user_id not in user_states:
-        user_states[user_id] = {
-            "mode": None,
-            "step": None,
-            "data": {},
-            "last_activity": datetime.now()
-        }
-    return user_states[user_id]
-
-def clear_user_state(user_id):
-    """Clear state user - THREAD SAFE"""
-    if user_id in user_states:
-        del user_states[user_id]
-    if user_id in user_locks:
-        del user_locks[user_id]
-
-def update_user_activity(user_id):
-    """Update waktu aktivitas terakhir user"""
-    if user_id in user_states:
-        user_states[user_id]["last_activity"] = datetime.now()
+    return session_backend.lock(user_id)
+
+async def get_user_state(user_id):
+    """Dapatkan state user dengan default values"""
+    return await session_backend.get(user_id)
+
+async def clear_user_state(user_id):
+    """Clear state user"""
+    await session_backend.clear(user_id)
+
+async def update_user_activity(user_id, user_state):
+    """Update waktu aktivitas terakhir user dan simpan state ke backend"""
+    user_state["last_activity"] = datetime.now()
+    await session_backend.save(user_id, user_state)
+
+# ===== SESSION SWEEPER =====
+session_stats = {"evicted_total": 0, "last_sweep_evicted": 0}
+
+async def get_session_stats():
+    """Jumlah session aktif dan yang sudah di-evict"""
+    return {
+        **(await session_backend.stats()),
+        **session_stats
+    }
+
+async def sweep_idle_sessions(ttl_seconds=SESSION_TTL_SECONDS):
+    """Evict state yang idle lebih dari TTL; lock yang sedang dipegang dilewati
+
+    Mengembalikan list (user_id, mode) yang di-evict. Backend redis
+    mengandalkan TTL key sehingga tidak ada yang di-evict di sini.
+    """
+    evicted = await session_backend.sweep(ttl_seconds)
+    session_stats["evicted_total"] += len(evicted)
+    session_stats["last_sweep_evicted"] = len(evicted)
+    return evicted
+
+async def session_sweep_loop(application: Application):
+    """Sweep berkala; beri tahu user yang prosesnya kedaluwarsa"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            evicted = await sweep_idle_sessions()
+            if not isinstance(session_backend, MemorySessionBackend):
+                session_stats["live_states"] = (await session_backend.stats())["live_states"]
+            if evicted:
+                logger.info(f"🧹 Evicted {len(evicted)} idle sessions, stats: {await get_session_stats()}")
+            if not SESSION_EXPIRY_NOTIFY:
+                continue
+            for user_id, mode in evicted:
+                if mode not in ("pengaduan", "cek_status"):
+                    continue
+                try:
+                    await application.bot.send_message(
+                        chat_id=user_id,
+                        text=(
+                            "⌛ <b>Sesi Anda telah berakhir</b> karena tidak ada aktivitas.\n\n"
+                            "Silakan mulai kembali dari menu utama."
+                        ),
+                        parse_mode="HTML",
+                        reply_markup=get_main_menu_keyboard()
+                    )
+                except Exception as e:
+                    logger.warning("⚠️ Failed to notify expired session for user %s: %s", user_id, e)
+        except Exception as e:
+            logger.error(f"❌ Session sweep failed: {e}")
 
 # ===== MENU BUTTON HANDLERS =====
 async def setup_menu_button(application: Application):
@@ -203,11 +412,163 @@ async def set_commands_menu(application: Application):
     except Exception as e:
         logger.error(f"❌ Gagal mengatur menu commands: {e}")
 
+# ===== SHEET SYNC =====
+async def sync_from_sheet():
+    """Tarik perubahan dari Google Sheets ke storage lokal dan index baris"""
+    fetch_started = time.monotonic()
+    changed = await storage.pull(fetch_started=fetch_started)
+    for ticket_id, old_status, new_status in changed:
+        await notify_status_change(ticket_id, old_status, new_status)
+    today = datetime.now(JAKARTA_TZ).strftime("%d%m%Y")
+    await ticket_counter.seed(storage.ticket_ids_for_day(today), today)
+    duplicate_index.prune(duplicate_window_start())
+
+async def sheet_sync_loop():
+    """Resync penuh berkala agar baris yang ditambah manual di sheet ikut terbaca"""
+    while True:
+        await asyncio.sleep(TICKET_INDEX_RESYNC_SECONDS)
+        try:
+            await sync_from_sheet()
+        except Exception as e:
+            logger.error(f"❌ Sheet sync failed: {e}")
+
+# ===== METRICS =====
+def session_gauge():
+    """Nilai gauge session untuk metrik"""
+    values = {"evicted_total": session_stats["evicted_total"]}
+    if isinstance(session_backend, MemorySessionBackend):
+        values["live"] = len(session_backend.states)
+        values["locks"] = len(session_backend.locks)
+    elif "live_states" in session_stats:
+        values["live"] = session_stats["live_states"]
+    return values
+
+def queue_depth_gauge():
+    """Kedalaman antrian internal untuk metrik"""
+    return {
+        "append_journal": append_queue.journal.pending_count(),
+        "finalization": finalization_pipeline.depth(),
+        "outbox": notification_outbox.stats()["pending"],
+        "updates": update_processor.queue_depth()
+    }
+
+def sheets_quota_gauge():
+    """Pemakaian kuota Sheets dan status circuit breaker untuk metrik"""
+    return {**sheets.quota_usage(), "circuit_open": int(sheets.circuit_state == "open")}
+
+metrics.SESSIONS.callback = session_gauge
+metrics.READINESS.callback = lambda: {component: int(done) for component, done in readiness.items()}
+metrics.SHEETS_QUOTA.callback = sheets_quota_gauge
+metrics.QUEUE_DEPTH.callback = queue_depth_gauge
+
+def instrumented(handler):
+    """Bungkus handler Telegram untuk mencatat latency dan error"""
+    name = handler.__name__
+    
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        with metrics.HANDLER_LATENCY.time(name):
+            try:
+                return await handler(update, context)
+            except Exception:
+                metrics.HANDLER_ERRORS.inc(name)
+                raise
+    return wrapper
+
+# ===== FLOOD CONTROL =====
+flood_limiter = UserRateLimiter(FLOOD_RATE, FLOOD_BURST)
+
+def flood_controlled(handler):
+    """Tolak update dari user yang mengirim pesan melebihi batas (admin tidak dibatasi)"""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        user = update.effective_user
+        if user and not is_admin(user.id):
+            allowed, warn = flood_limiter.check(user.id, update.message.media_group_id if update.message else None)
+            if not allowed:
+                metrics.FLOOD_REJECTED.inc()
+                if warn:
+                    await update.message.reply_text(
+                        "⏳ Terlalu banyak pesan. Mohon tunggu sebentar sebelum mengirim lagi."
+                    )
+                return
+        return await handler(update, context)
+    return wrapper
+
+# ===== STARTUP =====
+# Bot sudah melayani user dari storage lokal sebelum semua komponen siap
+readiness = {"sheets_connected": False, "initial_sync": False}
+
+def is_ready():
+    return all(readiness.values())
+
+async def with_retry(name, func, max_delay=300):
+    """Ulangi func() dengan exponential backoff + jitter sampai berhasil"""
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            delay = random.uniform(0, min(max_delay, 2 ** attempt))
+            attempt += 1
+            logger.error(f"❌ {name} failed (attempt {attempt}): {e}, retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def warm_up():
+    """Koneksi Sheets dan sync awal di background, lalu mulai loop yang butuh Sheets"""
+    started = time.perf_counter()
+    if sheets.worksheet is None:
+        await with_retry("Google Sheets connection", connect_sheets)
+    readiness["sheets_connected"] = True
+    await with_retry("Initial sheet sync", sync_from_sheet)
+    rebuild_duplicate_index()
+    readiness["initial_sync"] = True
+    logger.info(f"✅ Startup ready in {time.perf_counter() - started:.1f}s")
+    await resume_deferred_completions()
+    background_tasks.append(asyncio.create_task(sheet_sync_loop()))
+    if STATUS_WATCH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(status_watcher.run(STATUS_WATCH_INTERVAL)))
+
 # ===== POST INIT FUNCTION =====
 async def post_init(application: Application):
     """Setup setelah bot diinisialisasi"""
-    await set_commands_menu(application)
-    await setup_menu_button(application)
+    await claim_instance_lease()
+    await asyncio.gather(set_commands_menu(application), setup_menu_button(application))
+
+    # Index duplikat dari storage lokal dulu; dibangun ulang setelah sync awal
+    rebuild_duplicate_index()
+    background_tasks.append(asyncio.create_task(warm_up()))
+    background_tasks.append(asyncio.create_task(append_queue.run()))
+    background_tasks.append(asyncio.create_task(session_sweep_loop(application)))
+    if isinstance(session_backend, MemorySessionBackend):
+        background_tasks.append(asyncio.create_task(session_backend.store.run(SESSION_PERSIST_DEBOUNCE)))
+    else:
+        background_tasks.append(asyncio.create_task(instance_lease_loop()))
+    finalization_pipeline.start()
+    background_tasks.append(asyncio.create_task(notification_outbox.run(application.bot)))
+    if METRICS_PORT:
+        metrics_server = await metrics.start_http_server(int(METRICS_PORT), ready=is_ready)
+        background_tasks.append(asyncio.create_task(metrics_server.serve_forever()))
+
+async def post_shutdown(application: Application):
+    """Hentikan background task saat bot berhenti"""
+    await finalization_pipeline.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Flush terakhir; sisa baris tetap aman di journal untuk start berikutnya
+    await append_queue.flush()
+    append_queue.journal.close()
+    storage.primary.close()
+    try:
+        await session_backend.release_instance(INSTANCE_ID)
+    except Exception as e:
+        logger.error(f"❌ Failed to release instance lease: {e}")
+    await session_backend.close()
+    notification_outbox.close()
+    await evidence_store.close()
+    sheets.shutdown()
 
 # ===== HANDLERS =====
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -215,10 +576,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     
     async with get_user_lock(user_id):
-        clear_user_state(user_id)
-        user_state = get_user_state(user_id)
+        await clear_user_state(user_id)
+        user_state = await get_user_state(user_id)
         user_state["mode"] = "menu"
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
     welcome_text = (
         "🎉 <b>Selamat datang di Layanan Pengaduan Customer Service!</b>\n\n"
@@ -236,12 +597,16 @@ async def handle_buat_pengaduan(update: Update, context: ContextTypes.DEFAULT_TY
     """Memulai pengaduan baru - VALIDASI WEBSITE INPUT"""
     user_id = update.message.from_user.id
     
+    if daily_ticket_cap_reached(user_id):
+        await reply_daily_cap_reached(update)
+        return
+    
     async with get_user_lock(user_id):
-        clear_user_state(user_id)
-        user_state = get_user_state(user_id)
+        await clear_user_state(user_id)
+        user_state = await get_user_state(user_id)
         user_state["mode"] = "pengaduan"
         user_state["step"] = "nama_website"
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
     await update.message.reply_text(
         "📝 <b>Membuat Pengaduan Baru</b>\n\n"
@@ -256,14 +621,24 @@ async def handle_cek_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     
     async with get_user_lock(user_id):
-        clear_user_state(user_id)
-        user_state = get_user_state(user_id)
+        await clear_user_state(user_id)
+        user_state = await get_user_state(user_id)
         user_state["mode"] = "cek_status"
         user_state["step"] = "input_tiket"
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
+    
+    # Tiket terakhir user, supaya nomor tiket tidak perlu diingat
+    recent_tickets = "".join(
+        f"• <code>{escape_html(ticket['Ticket ID'])}</code> "
+        f"{STATUS_EMOJI.get(ticket['Status'], '⚪')} {escape_html(ticket['Status'])}\n"
+        for ticket in storage.list_by_user(user_id, limit=RECENT_TICKETS_SHOWN)
+    )
+    if recent_tickets:
+        recent_tickets = f"📂 <b>Tiket terakhir Anda:</b>\n{recent_tickets}\n"
     
     await update.message.reply_text(
         "🔍 <b>Cek Status Tiket Pengaduan</b>\n\n"
+        f"{recent_tickets}"
         "Silakan masukkan <b>Nomor Tiket</b> yang Anda terima:\n\n"
         "🎫 <b>Format tiket:</b> <code>KODE-TANGGAL-NOMOR</code>\n\n"
         "✍️ <b>Ketik nomor tiket Anda:</b>",
@@ -318,10 +693,10 @@ async def handle_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     
     async with get_user_lock(user_id):
-        clear_user_state(user_id)
-        user_state = get_user_state(user_id)
+        await clear_user_state(user_id)
+        user_state = await get_user_state(user_id)
         user_state["mode"] = "menu"
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
     await update.message.reply_text(
         "❌ <b>Proses dibatalkan</b>\n\n"
@@ -357,12 +732,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Dapatkan state user dengan lock
     async with get_user_lock(user_id):
-        user_state = get_user_state(user_id)
+        user_state = await get_user_state(user_id)
         mode = user_state.get("mode")
         step = user_state.get("step")
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
-    logger.info(f"User {user_id} message: {user_message}, mode: {mode}, step: {step}")
+    # Isi pesan tidak dicatat (data keluhan user), hanya panjangnya
+    logger.debug("User %s message (%d chars), mode: %s, step: %s", user_id, len(user_message), mode, step)
     
     # Handle berdasarkan mode dengan lock yang sesuai
     if mode == "pengaduan":
@@ -370,14 +746,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif mode == "cek_status" and step == "input_tiket":
         await proses_cek_status(update, context, user_message, user_id)
     else:
-        logger.warning(f"Unknown state for user {user_id}: mode={mode}, step={step}")
+        logger.warning("Unknown state for user %s: mode=%s, step=%s", user_id, mode, step)
         async with get_user_lock(user_id):
-            clear_user_state(user_id)
+            await clear_user_state(user_id)
         await show_menu(update, context)
 
 async def handle_bukti_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, selection: str, user_id: int):
     """Handle pemilihan opsi bukti - VERSI DIPERBAIKI"""
-    logger.info(f"Handling bukti selection for user {user_id}: {selection}")
+    logger.debug("Handling bukti selection for user %s: %s", user_id, selection)
     
     if selection == "📸 Kirim Foto Bukti":
         await update.message.reply_text(
@@ -389,11 +765,15 @@ async def handle_bukti_selection(update: Update, context: ContextTypes.DEFAULT_T
     elif selection == "⏩ Lewati Tanpa Foto":
         # PERBAIKAN: Update state sebelum melanjutkan
         async with get_user_lock(user_id):
-            user_state = get_user_state(user_id)
+            user_state = await get_user_state(user_id)
+            if user_state.get("mode") != "pengaduan" or user_state.get("step") != "bukti":
+                # Tap ganda: flow sudah diselesaikan oleh tap sebelumnya
+                logger.debug("Ignoring skip-photo from user %s, step: %s", user_id, user_state.get("step"))
+                return
             user_state["data"]["bukti"] = "Tidak ada bukti foto"
             user_state["step"] = "completed"  # Mark as completed to prevent stuck
-            update_user_activity(user_id)
-            logger.info(f"User {user_id} memilih tanpa foto, state updated")
+            await update_user_activity(user_id, user_state)
+            logger.debug("User %s memilih tanpa foto, state updated", user_id)
         
         await update.message.reply_text(
             "⏩ <b>Melanjutkan tanpa foto bukti...</b>",
@@ -401,31 +781,29 @@ async def handle_bukti_selection(update: Update, context: ContextTypes.DEFAULT_T
             reply_markup=ReplyKeyboardRemove()
         )
         
-        # Beri sedikit delay untuk memastikan state tersimpan
-        await asyncio.sleep(1)
-        
         await selesaikan_pengaduan(update, context, user_id)
 
 async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TYPE, user_message: str, user_id: int):
     """Handle flow pengaduan - DENGAN LOCK MANAGEMENT"""
     async with get_user_lock(user_id):
-        user_state = get_user_state(user_id)
+        user_state = await get_user_state(user_id)
         step = user_state.get("step", "")
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
-    logger.info(f"Pengaduan flow for user {user_id}, step: {step}")
+    logger.debug("Pengaduan flow for user %s, step: %s", user_id, step)
     
     if step == "nama_website":
         # VALIDASI INPUT WEBSITE
-        website_name, website_code = validate_website_input(user_message)
+        match = validate_website_input(user_message)
         
-        if website_name and website_code:
+        if match.status == "ok":
             # Website valid, lanjutkan
+            website_name, website_code = match.name, match.code
             async with get_user_lock(user_id):
                 user_state["data"]["website_name"] = website_name
                 user_state["data"]["website_code"] = website_code
                 user_state["step"] = "nama"
-                update_user_activity(user_id)
+                await update_user_activity(user_id, user_state)
             
             await update.message.reply_text(
                 f"✅ <b>Website valid: {website_name}</b>\n\n"
@@ -434,6 +812,16 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
                 parse_mode="HTML",
                 reply_markup=get_cancel_only_keyboard()
             )
+        elif match.status == "ambiguous":
+            # Cocok dengan lebih dari satu website, minta user memperjelas
+            pilihan = "\n".join(f"• {escape_html(name)}" for name in match.candidates)
+            await update.message.reply_text(
+                "⚠️ <b>Nama website kurang jelas.</b>\n\n"
+                f"Maksud Anda salah satu dari:\n{pilihan}\n\n"
+                "✍️ <b>Tulis nama website yang dimaksud:</b>",
+                parse_mode="HTML",
+                reply_markup=get_cancel_only_keyboard()
+            )
         else:
             # Website tidak valid, minta input ulang
             await update.message.reply_text(
@@ -455,7 +843,7 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
             user_state["data"]["contact_method"] = user_info["contact_method"]
             user_state["data"]["full_name_tg"] = user_info["full_name"]
             user_state["step"] = "username_website"
-            update_user_activity(user_id)
+            await update_user_activity(user_id, user_state)
         
         website_name = user_state["data"]["website_name"]
         
@@ -470,7 +858,7 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
         async with get_user_lock(user_id):
             user_state["data"]["username_website"] = user_message
             user_state["step"] = "keluhan"
-            update_user_activity(user_id)
+            await update_user_activity(user_id, user_state)
         
         await update.message.reply_text(
             "📋 <b>Jelaskan keluhan Anda secara detail:</b>\n\n"
@@ -483,7 +871,7 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
         async with get_user_lock(user_id):
             user_state["data"]["keluhan"] = user_message
             user_state["step"] = "bukti"
-            update_user_activity(user_id)
+            await update_user_activity(user_id, user_state)
         
         await update.message.reply_text(
             "📸 <b>Bukti Pendukung (Opsional)</b>\n\n"
@@ -495,8 +883,46 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
             reply_markup=get_skip_photo_keyboard()
         )
     
+    elif step == "konfirmasi_duplikat":
+        if user_message == "🆕 Buat Tiket Baru":
+            async with get_user_lock(user_id):
+                user_state = await get_user_state(user_id)
+                user_state["data"]["duplicate_checked"] = True
+                user_state["step"] = "completed"
+                await update_user_activity(user_id, user_state)
+            await selesaikan_pengaduan(update, context, user_id)
+        elif user_message == "🔗 Gabungkan ke Tiket Lama":
+            async with get_user_lock(user_id):
+                user_state = await get_user_state(user_id)
+                data = user_state["data"].copy()
+                ticket_id = data.get("duplicate_of", "")
+                ticket_gone = storage.get_ticket(ticket_id) is None
+                if ticket_gone:
+                    # Tiket lama sudah tidak ada: lanjut buat tiket baru
+                    user_state["data"]["duplicate_checked"] = True
+                    user_state["step"] = "completed"
+                    await update_user_activity(user_id, user_state)
+                else:
+                    await clear_user_state(user_id)
+            if ticket_gone:
+                await selesaikan_pengaduan(update, context, user_id)
+                return
+            await gabungkan_pengaduan(ticket_id, data, user_id)
+            await update.message.reply_text(
+                f"🔗 <b>Pengaduan digabung ke tiket <code>{escape_html(ticket_id)}</code>.</b>\n\n"
+                "Tiket tersebut masih diproses. Anda akan menerima notifikasi saat statusnya berubah.",
+                parse_mode="HTML",
+                reply_markup=get_main_menu_keyboard()
+            )
+        else:
+            await update.message.reply_text(
+                "Silakan pilih <b>🔗 Gabungkan ke Tiket Lama</b> atau <b>🆕 Buat Tiket Baru</b>:",
+                parse_mode="HTML",
+                reply_markup=get_duplicate_keyboard()
+            )
+    
     else:
-        logger.warning(f"Unexpected step for user {user_id}: {step}")
+        logger.warning("Unexpected step for user %s: %s", user_id, step)
         await update.message.reply_text(
             "❌ <b>Terjadi error dalam proses.</b>\n\n"
             "Silakan mulai kembali dengan memilih menu di bawah:",
@@ -504,30 +930,48 @@ async def handle_pengaduan_flow(update: Update, context: ContextTypes.DEFAULT_TY
             reply_markup=get_main_menu_keyboard()
         )
         async with get_user_lock(user_id):
-            clear_user_state(user_id)
+            await clear_user_state(user_id)
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle photo untuk bukti - VERSI DIPERBAIKI"""
     user_id = update.message.from_user.id
     
     async with get_user_lock(user_id):
-        user_state = get_user_state(user_id)
+        user_state = await get_user_state(user_id)
         mode = user_state.get("mode")
         step = user_state.get("step")
-        update_user_activity(user_id)
+        await update_user_activity(user_id, user_state)
     
-    logger.info(f"Photo received from user {user_id}, mode: {mode}, step: {step}")
+    logger.debug("Photo received from user %s, mode: %s, step: %s", user_id, mode, step)
     
+    media_group_id = update.message.media_group_id
     if mode == "pengaduan" and step == "bukti":
         try:
-            file_id = update.message.photo[-1].file_id
-            file_obj = await context.bot.get_file(file_id)
+            photo = update.message.photo[-1]
             
             async with get_user_lock(user_id):
-                user_state["data"]["bukti"] = file_obj.file_path
-                user_state["step"] = "completed"  # Mark as completed
-                update_user_activity(user_id)
-                logger.info(f"Photo saved for user {user_id}, file_path: {file_obj.file_path}")
+                photos = user_state["data"].setdefault("bukti_photos", [])
+                if all(p["file_unique_id"] != photo.file_unique_id for p in photos):
+                    photos.append({"file_id": photo.file_id, "file_unique_id": photo.file_unique_id})
+                first_in_album = bool(media_group_id) and user_state["data"].get("media_group_id") != media_group_id
+                if media_group_id:
+                    user_state["data"]["media_group_id"] = media_group_id
+                else:
+                    user_state["step"] = "completed"  # Mark as completed
+                await update_user_activity(user_id, user_state)
+                logger.debug("Photo saved for user %s, file_unique_id: %s", user_id, photo.file_unique_id)
+            
+            if evidence_store.base_url:
+                # Download ke evidence store di background, ditunggu worker finalisasi
+                evidence_store.prefetch(context.bot, photo.file_id, photo.file_unique_id)
+            
+            if media_group_id:
+                # Album: satu pengaduan setelah semua foto album masuk
+                if first_in_album:
+                    task = asyncio.create_task(selesaikan_album(update, context, user_id, media_group_id))
+                    album_tasks.add(task)
+                    task.add_done_callback(album_tasks.discard)
+                return
             
             await update.message.reply_text(
                 "✅ <b>Foto bukti berhasil diterima!</b>\n\n"
@@ -536,81 +980,291 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=ReplyKeyboardRemove()
             )
             
-            # Beri sedikit delay untuk memastikan state tersimpan
-            await asyncio.sleep(1)
-            
             await selesaikan_pengaduan(update, context, user_id)
             
         except Exception as e:
-            logger.error(f"Error processing photo for user {user_id}: {e}")
+            logger.error("Error processing photo for user %s: %s", user_id, e)
             await update.message.reply_text(
                 "❌ <b>Gagal memproses foto.</b>\n\n"
                 "Silakan coba lagi atau pilih '⏩ Lewati Tanpa Foto'.",
                 parse_mode="HTML",
                 reply_markup=get_skip_photo_keyboard()
             )
+    elif media_group_id and media_group_id in finished_albums:
+        # Foto album yang datang setelah pengaduan diselesaikan
+        return
     else:
         await update.message.reply_text(
             "❌ Foto tidak diperlukan saat ini.\n\nSilakan pilih menu yang sesuai:",
             reply_markup=get_main_menu_keyboard()
         )
 
+# Foto bukti disimpan lokal per hash isi, bukan URL Telegram yang kedaluwarsa
+evidence_store = EvidenceStore(EVIDENCE_DIR, base_url=EVIDENCE_BASE_URL)
+album_tasks = set()
+finished_albums = {}  # media_group_id -> waktu selesai
+
+async def selesaikan_album(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, media_group_id: str):
+    """Tunggu semua foto album masuk, lalu selesaikan pengaduan sekali"""
+    await asyncio.sleep(EVIDENCE_ALBUM_WAIT)
+    try:
+        async with get_user_lock(user_id):
+            user_state = await get_user_state(user_id)
+            data = user_state.get("data", {})
+            if user_state.get("step") != "bukti" or data.get("media_group_id") != media_group_id:
+                return
+            user_state["step"] = "completed"
+            count = len(data.get("bukti_photos", []))
+            await update_user_activity(user_id, user_state)
+        
+        finished_albums[media_group_id] = time.monotonic()
+        while len(finished_albums) > 1000:
+            finished_albums.pop(next(iter(finished_albums)))
+        
+        await update.message.reply_text(
+            f"✅ <b>{count} foto bukti berhasil diterima!</b>\n\n"
+            "🔄 <b>Menyimpan pengaduan Anda...</b>",
+            parse_mode="HTML",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        await selesaikan_pengaduan(update, context, user_id)
+    except Exception as e:
+        logger.error("Error processing photo album for user %s: %s", user_id, e)
+
+def build_ticket_record(ticket_id, timestamp, data):
+    """Susun record tiket (key sesuai header sheet) dari data pengaduan"""
+    return {
+        "Timestamp": timestamp,
+        "Ticket ID": ticket_id,
+        "Nama Website": data["website_name"],            # Sudah divalidasi
+        "Nama": data["nama"],
+        "Username Website": data["username_website"],
+        "Keluhan": data["keluhan"],
+        "Bukti": data.get("bukti", "Tidak ada bukti foto"),
+        "Username_TG": data["username_tg"],              # Username_TG atau User ID
+        "User_ID": data["user_id"],
+        "Contact Method": data.get("contact_method", "User ID"),
+        "Full Name Telegram": data.get("full_name_tg", ""),
+        "Status": "Sedang diproses"
+    }
+
+async def proses_finalisasi(ticket_id, job):
+    """Worker finalisasi: simpan foto bukti ke evidence store lalu perbarui kolom Bukti"""
+    references = await evidence_store.references(job["bot"], job["photos"])
+    bukti = "\n".join(references)
+    if bukti != job["bukti"]:
+        # Tiket sudah tersimpan dengan file_id; ganti dengan URL evidence store
+        await storage.update_field_mirrored(ticket_id, "Bukti", bukti)
+    logger.info("📎 Evidence of %s stored: %s photos", ticket_id, len(references))
+
+# ===== DUPLICATE DETECTION =====
+# Keluhan tiket open terbaru, per (website, user), untuk deteksi pengaduan berulang
+duplicate_index = DuplicateIndex(threshold=DUPLICATE_THRESHOLD)
+
+def duplicate_scope(website_name, user_id):
+    return (str(website_name), str(user_id))
+
+def ticket_day(ticket_id):
+    """Tanggal tiket dari bagian DDMMYYYY di Ticket ID"""
+    parsed = parse_ticket_id(ticket_id)
+    return datetime.strptime(parsed[1], "%d%m%Y").date() if parsed else None
+
+def duplicate_window_start():
+    return datetime.now(JAKARTA_TZ).date() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+
+def rebuild_duplicate_index():
+    """Bangun index dari tiket open di storage lokal (saat startup)"""
+    if DUPLICATE_WINDOW_DAYS <= 0:
+        return
+    since = duplicate_window_start()
+    for record in storage.list_open():
+        day = ticket_day(record["Ticket ID"])
+        if day and day >= since:
+            duplicate_index.add(
+                record["Ticket ID"], duplicate_scope(record["Nama Website"], record["User_ID"]),
+                record["Keluhan"], day
+            )
+    logger.info(f"🔁 Duplicate index loaded: {len(duplicate_index)} open tickets")
+
+def find_open_duplicate(data, user_id):
+    """Tiket open milik user di website yang sama dengan keluhan mirip, atau None"""
+    if DUPLICATE_WINDOW_DAYS <= 0:
+        return None
+    matches = duplicate_index.find(
+        duplicate_scope(data.get("website_name"), user_id), data.get("keluhan", ""),
+        since=duplicate_window_start()
+    )
+    for ticket_id, similarity in matches:
+        ticket = storage.get_ticket(ticket_id)
+        if ticket and ticket.get("Status") not in CLOSED_STATUSES:
+            logger.info("🔁 Complaint from user %s matches %s (%.0f%%)", user_id, ticket_id, similarity * 100)
+            return ticket
+        duplicate_index.remove(ticket_id)
+    return None
+
+async def gabungkan_pengaduan(ticket_id, data, user_id):
+    """Catat laporan ulang di Keluhan tiket lama dan kirim isinya ke admin lewat outbox"""
+    ticket = storage.get_ticket(ticket_id) or {}
+    keluhan_baru = data.get("keluhan", "")
+    keluhan = f"{ticket.get('Keluhan', '')}\n[{get_jakarta_time()}] Laporan ulang: {keluhan_baru}"
+    await storage.update_field_mirrored(ticket_id, "Keluhan", keluhan)
+    
+    event = f"relink:{time.time():.0f}"
+    message = (
+        f"🔁 <b>LAPORAN ULANG</b>\n\n"
+        f"🎫 <b>Ticket ID:</b> <code>{escape_html(ticket_id)}</code>\n"
+        f"👤 <b>User ID:</b> <code>{user_id}</code>\n"
+        f"💬 <b>Keluhan baru:</b> {escape_html(keluhan_baru)}"
+    )
+    notification_outbox.enqueue(ticket_id, ADMIN_IDS, message, event=event)
+    photos = [photo["file_id"] for photo in data.get("bukti_photos", [])]
+    if photos:
+        notification_outbox.enqueue(
+            ticket_id, ADMIN_IDS, f"📎 Bukti laporan ulang <code>{ticket_id}</code>",
+            event=f"{event}:bukti", photos=photos
+        )
+    logger.info("User %s re-reported ticket %s", user_id, ticket_id)
+
+def daily_ticket_cap_reached(user_id):
+    """Cek batas tiket harian per user (admin tidak dibatasi)"""
+    if DAILY_TICKET_CAP <= 0 or is_admin(user_id):
+        return False
+    today = datetime.now(JAKARTA_TZ).strftime("%d%m%Y")
+    return storage.count_by_user_for_day(user_id, today) >= DAILY_TICKET_CAP
+
+async def reply_daily_cap_reached(update: Update):
+    await update.message.reply_text(
+        "⛔ <b>Batas pengaduan harian tercapai.</b>\n\n"
+        f"Anda sudah membuat {DAILY_TICKET_CAP} pengaduan hari ini. "
+        "Silakan cek status tiket Anda atau coba lagi besok.",
+        parse_mode="HTML",
+        reply_markup=get_main_menu_keyboard()
+    )
+
+# Download foto bukti berjalan di background agar user langsung menerima nomor tiket
+finalization_pipeline = FinalizationPipeline(proses_finalisasi, workers=FINALIZE_WORKERS)
+
+# Pengaduan selesai sebelum counter tiket di-seed: user_id -> (update, context)
+deferred_completions = {}
+
+async def resume_deferred_completions():
+    """Selesaikan pengaduan yang ditunda menunggu sync awal"""
+    while deferred_completions:
+        user_id, (update, context) = deferred_completions.popitem()
+        try:
+            await selesaikan_pengaduan(update, context, user_id)
+        except Exception as e:
+            logger.error("❌ Deferred complaint of user %s failed: %s", user_id, e)
+
 async def selesaikan_pengaduan(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
-    """Selesaikan pengaduan dan simpan ke Google Sheets - VERSI DIPERBAIKI"""
-    logger.info(f"Starting selesaikan_pengaduan for user {user_id}")
+    """Selesaikan pengaduan: simpan tiket, balas user, download bukti di background"""
+    logger.debug("Starting selesaikan_pengaduan for user %s", user_id)
     
     # Ambil data dengan lock
     async with get_user_lock(user_id):
-        user_state = get_user_state(user_id)
+        user_state = await get_user_state(user_id)
+        # Idempoten: flow "completed" hanya bisa difinalisasi sekali (state dihapus di bawah)
+        if user_state.get("mode") != "pengaduan" or user_state.get("step") != "completed":
+            logger.warning("⚠️ Duplicate submission ignored for user %s", user_id)
+            return
         if not user_state.get("data"):
-            logger.error(f"No data found for user {user_id}")
+            logger.error("No data found for user %s", user_id)
             await update.message.reply_text(
                 "❌ <b>Data pengaduan tidak ditemukan.</b>\n\n"
                 "Silakan mulai kembali dari menu utama.",
                 parse_mode="HTML",
                 reply_markup=get_main_menu_keyboard()
             )
-            clear_user_state(user_id)
+            await clear_user_state(user_id)
             return
-            
-        data = user_state["data"].copy()  # Copy data untuk menghindari race condition
-        update_user_activity(user_id)
-        logger.info(f"Data retrieved for user {user_id}: {list(data.keys())}")
+        
+        # Keluhan mirip tiket open milik user ini: tawarkan gabung dulu
+        duplicate = None
+        deferred = notify_deferred = False
+        if not user_state["data"].get("duplicate_checked"):
+            duplicate = find_open_duplicate(user_state["data"], user_id)
+        if duplicate:
+            user_state["step"] = "konfirmasi_duplikat"
+            user_state["data"]["duplicate_of"] = duplicate["Ticket ID"]
+            await update_user_activity(user_id, user_state)
+        elif not ticket_counter.seeded:
+            # Sync awal belum selesai: state tetap "completed", nomor tiket dibuat setelah seed
+            deferred = True
+            notify_deferred = user_id not in deferred_completions
+            deferred_completions[user_id] = (update, context)
+        else:
+            data = user_state["data"].copy()  # Copy data untuk menghindari race condition
+            await clear_user_state(user_id)
+            logger.debug("Data retrieved for user %s: %s", user_id, list(data.keys()))
+    
+    if duplicate:
+        await update.message.reply_text(
+            "🔁 <b>Pengaduan serupa sudah ada!</b>\n\n"
+            f"🎫 <b>Ticket ID:</b> <code>{escape_html(duplicate['Ticket ID'])}</code>\n"
+            f"📊 <b>Status:</b> {escape_html(duplicate.get('Status', ''))}\n"
+            f"💬 <b>Keluhan:</b> {escape_html(duplicate.get('Keluhan', ''))}\n\n"
+            "Gabungkan pengaduan ini ke tiket tersebut, atau tetap buat tiket baru?",
+            parse_mode="HTML",
+            reply_markup=get_duplicate_keyboard()
+        )
+        return
+    
+    if deferred:
+        if notify_deferred:
+            await update.message.reply_text(
+                "⏳ <b>Pengaduan Anda sudah diterima.</b>\n\n"
+                "Sistem sedang sinkronisasi data tiket. Nomor tiket akan dikirim begitu selesai.",
+                parse_mode="HTML",
+                reply_markup=ReplyKeyboardRemove()
+            )
+        return
+    
+    if daily_ticket_cap_reached(user_id):
+        await reply_daily_cap_reached(update)
+        return
     
     timestamp = get_jakarta_time()
     
     # Generate ticket number berdasarkan kode website yang valid
     website_code = data["website_code"]
-    ticket_id = generate_ticket_number(website_code)
+    ticket_id = await generate_ticket_number(website_code)
     
-    logger.info(f"Processing new complaint from user {user_id}: {ticket_id}")
+    logger.info("Processing new complaint from user %s: %s", user_id, ticket_id)
     
+    if data.get("bukti_photos"):
+        # file_id Telegram permanen; diganti URL evidence store setelah foto diunduh.
+        # Tanpa EVIDENCE_BASE_URL foto hanya dikirim ke admin lewat Telegram
+        data["bukti"] = "\n".join(
+            [f"📸 {len(data['bukti_photos'])} foto, dikirim ke admin lewat Telegram"]
+            + [f"telegram:{photo['file_id']}" for photo in data["bukti_photos"]]
+        )
     try:
-        # Save to Google Sheets
-        worksheet.append_row([
-            timestamp,                           # Timestamp
-            ticket_id,                           # Ticket ID
-            data["website_name"],                # Website Name (yang sudah divalidasi)
-            data["nama"],                        # Nama
-            data["username_website"],            # Username Website  
-            data["keluhan"],                     # Keluhan
-            data.get("bukti", "Tidak ada bukti foto"), # Bukti
-            data["username_tg"],                 # Username_TG atau User ID
-            data["user_id"],                     # User_ID
-            data.get("contact_method", "User ID"), # Contact Method
-            data.get("full_name_tg", ""),        # Full Name Telegram
-            "Sedang diproses"                    # Status
-        ])
-        logger.info(f"✅ Data saved to Google Sheets: {ticket_id}")
+        # Simpan ke storage lokal (SQLite + journal) sebelum membalas user;
+        # mirror ke Google Sheets lewat append queue
+        storage.create_ticket(build_ticket_record(ticket_id, timestamp, data))
     except Exception as e:
-        logger.error(f"❌ Failed to save to Google Sheets: {e}")
+        logger.error("❌ Failed to save ticket %s: %s", ticket_id, e)
         await update.message.reply_text(
-            "❌ Maaf, terjadi gangguan sistem. Silakan coba lagi nanti.\n\nSilakan pilih menu:",
+            f"❌ Maaf, tiket <code>{ticket_id}</code> gagal disimpan karena gangguan sistem.\n\n"
+            "Silakan buat pengaduan kembali.",
+            parse_mode="HTML",
             reply_markup=get_main_menu_keyboard()
         )
-        async with get_user_lock(user_id):
-            clear_user_state(user_id)
         return
+    duplicate_index.add(
+        ticket_id, duplicate_scope(data["website_name"], user_id), data["keluhan"], ticket_day(ticket_id)
+    )
+    logger.info("✅ Ticket saved: %s", ticket_id)
+    
+    # Notify admin lewat outbox (persisten); pengiriman dan retry dikerjakan worker outbox
+    kirim_notifikasi_admin(data, ticket_id, timestamp)
+    
+    if data.get("bukti_photos") and evidence_store.base_url:
+        await finalization_pipeline.submit(ticket_id, {
+            "bot": context.bot,
+            "photos": data["bukti_photos"],
+            "bukti": data["bukti"]
+        })
 
     # Dapatkan info user untuk success message
     user_info = get_user_contact_info(update.message.from_user)
@@ -638,127 +1292,137 @@ async def selesaikan_pengaduan(update: Update, context: ContextTypes.DEFAULT_TYP
         parse_mode="HTML",
         reply_markup=get_main_menu_keyboard()
     )
+    logger.info("Pengaduan %s acknowledged for user %s", ticket_id, user_id)
 
-    # Notify admin dengan info kontak yang lengkap
-    await kirim_notifikasi_admin_with_retry(context, data, ticket_id, timestamp, user_id)
-    
-    async with get_user_lock(user_id):
-        clear_user_state(user_id)
-        logger.info(f"Pengaduan completed and state cleared for user {user_id}")
+# Fan-out notifikasi paralel dengan rate limit global dan per chat
+notification_dispatcher = NotificationDispatcher(
+    global_rate=NOTIFY_GLOBAL_RATE,
+    per_chat_rate=NOTIFY_PER_CHAT_RATE
+)
+# Outbox persisten: notifikasi admin dikirim worker dengan backoff
+notification_outbox = NotificationOutbox(
+    NOTIFICATION_OUTBOX_FILE,
+    notification_dispatcher,
+    max_attempts=OUTBOX_MAX_ATTEMPTS
+)
 
-async def kirim_notifikasi_admin_with_retry(context, data, ticket_id, timestamp, user_id, retry_count=3):
-    """Kirim notifikasi ke admin dengan retry mechanism"""
-    for attempt in range(retry_count):
-        try:
-            success = await kirim_notifikasi_admin(context, data, ticket_id, timestamp)
-            if success:
-                logger.info(f"✅ Notifications sent successfully for ticket {ticket_id}")
-                return
-            else:
-                logger.warning(f"⚠️ Some notifications failed for ticket {ticket_id}, attempt {attempt + 1}")
-        except Exception as e:
-            logger.error(f"❌ Error sending notifications for ticket {ticket_id}, attempt {attempt + 1}: {e}")
-        
-        if attempt < retry_count - 1:
-            await asyncio.sleep(2)
-    
-    logger.error(f"❌ All notification attempts failed for ticket {ticket_id}")
+def kirim_notifikasi_admin(data, ticket_id, timestamp):
+    """Masukkan notifikasi pengaduan baru ke outbox untuk semua admin"""
+    message = render_notifikasi_admin(data, ticket_id, timestamp)
+    queued = notification_outbox.enqueue(ticket_id, ADMIN_IDS, message)
+    photos = [photo["file_id"] for photo in data.get("bukti_photos", [])]
+    if photos:
+        # Foto bukti dikirim ulang lewat file_id, tanpa perlu URL publik
+        notification_outbox.enqueue(
+            ticket_id, ADMIN_IDS, f"📎 Bukti tiket <code>{ticket_id}</code>", event="bukti", photos=photos
+        )
+    logger.info("📬 Notification for %s queued for %s/%s admins", ticket_id, queued, len(ADMIN_IDS))
 
-async def kirim_notifikasi_admin(context, data, ticket_id, timestamp):
-    """Send notification to admin dengan info kontak lengkap"""
+# ===== STATUS FEED =====
+STATUS_EMOJI = {
+    'Sedang diproses': '🟡',
+    'Selesai': '✅',
+    'Ditolak': '❌',
+    'Menunggu konfirmasi': '🟠'
+}
+
+async def notify_status_change(ticket_id, old_status, new_status):
+    """Kirim update status tiket ke user pemilik tiket lewat outbox"""
+    if not instance_lease["held"]:
+        # Worker lain yang memegang lease mengirim notifikasi ini
+        logger.debug("Status change of %s left to the lease holder", ticket_id)
+        return
+    ticket = storage.get_ticket(ticket_id)
     try:
-        # Escape data untuk HTML
-        nama_escaped = escape_html(data.get("nama", ""))
-        username_website_escaped = escape_html(data.get("username_website", ""))
-        keluhan_escaped = escape_html(data.get("keluhan", ""))
-        username_tg_escaped = escape_html(data.get("username_tg", ""))
-        user_id_escaped = escape_html(data.get("user_id", ""))
-        website_escaped = escape_html(data.get("website_name", ""))
-        contact_method = data.get("contact_method", "User ID")
-        full_name_tg = escape_html(data.get("full_name_tg", ""))
-        
-        bukti_text = data.get("bukti", "Tidak ada bukti foto")
-        if bukti_text != "Tidak ada bukti foto" and bukti_text.startswith("http"):
-            bukti_display = f'<a href="{bukti_text}">📎 Lihat Bukti</a>'
-        else:
-            bukti_display = escape_html(bukti_text)
-        
-        # Buat message untuk admin dengan info kontak lengkap
-        message = (
-            f"🚨 <b>PENGADUAN BARU DITERIMA</b> 🚨\n\n"
-            f"🎫 <b>Ticket ID:</b> <code>{ticket_id}</code>\n"
-            f"🌐 <b>Website:</b> {website_escaped}\n"
-            f"⏰ <b>Waktu:</b> {timestamp} (WIB)\n\n"
-            f"<b>📋 DATA PELAPOR:</b>\n"
-            f"• <b>Nama Lengkap:</b> {nama_escaped}\n"
-            f"• <b>Username {website_escaped}:</b> {username_website_escaped}\n"
-            f"• <b>Nama Telegram:</b> {full_name_tg}\n"
-            f"• <b>Kontak Telegram:</b> {username_tg_escaped}\n"
-            f"• <b>Metode Kontak:</b> {contact_method}\n"
-            f"• <b>User ID:</b> <code>{user_id_escaped}</code>\n\n"
-            f"<b>📝 KELUHAN:</b>\n{keluhan_escaped}\n\n"
-            f"<b>📎 BUKTI:</b> {bukti_display}\n\n"
-            f"<b>📞 CARA HUBUNGI:</b>\n"
-        )
-        
-        # Tambahkan instruksi berdasarkan metode kontak
-        if "Username" in contact_method:
-            message += f"• Gunakan: <b>{username_tg_escaped}</b>\n"
-            message += f"• Atau User ID: <code>{user_id_escaped}</code>\n\n"
-        else:
-            message += f"• Gunakan User ID: <code>{user_id_escaped}</code>\n"
-            message += "• User tanpa username, gunakan ID untuk direct message\n\n"
-        
-        message += "⚠️ <b>Segera hubungi dan tindak lanjuti pengaduan ini!</b>"
-        
-        success_count = 0
-        for admin_id in ADMIN_IDS:
-            try:
-                await context.bot.send_message(
-                    chat_id=admin_id,
-                    text=message,
-                    parse_mode="HTML",
-                    disable_web_page_preview=True
-                )
-                success_count += 1
-                logger.info(f"✅ Notification sent to admin {admin_id}")
-            except Exception as e:
-                logger.error(f"❌ Failed to send to admin {admin_id}: {e}")
-        
-        logger.info(f"📊 Notifications sent to {success_count}/{len(ADMIN_IDS)} admins")
-        return success_count > 0
-        
-    except Exception as e:
-        logger.error(f"❌ Error in kirim_notifikasi_admin: {e}")
-        return False
+        user_id = int(ticket.get("User_ID")) if ticket else None
+    except (TypeError, ValueError):
+        user_id = None
+    if not user_id:
+        logger.warning("⚠️ No owner to notify for status change of %s", ticket_id)
+        return
+    
+    status_emoji = STATUS_EMOJI.get(new_status, '⚪')
+    message = (
+        f"🔔 <b>UPDATE STATUS PENGADUAN</b>\n\n"
+        f"🎫 <b>Ticket ID:</b> <code>{escape_html(ticket_id)}</code>\n"
+        f"{status_emoji} <b>Status:</b> <b>{escape_html(new_status)}</b>\n"
+        f"↩️ <b>Sebelumnya:</b> {escape_html(old_status)}\n\n"
+        f"Terima kasih telah menggunakan layanan kami! 🙏"
+    )
+    notification_outbox.enqueue(ticket_id, [user_id], message, event=f"status:{time.time():.0f}")
+    logger.info("🔔 Status of %s changed: %s -> %s", ticket_id, old_status, new_status)
+
+# Pantau kolom Ticket ID + Status saja, bukan seluruh sheet
+status_watcher = StatusWatcher(sheets, storage, ticket_index, notify_status_change)
+
+def render_notifikasi_admin(data, ticket_id, timestamp):
+    """Render pesan notifikasi admin dengan info kontak lengkap (sekali untuk semua admin)"""
+    # Escape data untuk HTML
+    nama_escaped = escape_html(data.get("nama", ""))
+    username_website_escaped = escape_html(data.get("username_website", ""))
+    keluhan_escaped = escape_html(data.get("keluhan", ""))
+    username_tg_escaped = escape_html(data.get("username_tg", ""))
+    user_id_escaped = escape_html(data.get("user_id", ""))
+    website_escaped = escape_html(data.get("website_name", ""))
+    contact_method = data.get("contact_method", "User ID")
+    full_name_tg = escape_html(data.get("full_name_tg", ""))
+    
+    photos = data.get("bukti_photos", [])
+    if photos:
+        bukti_display = f"📸 {len(photos)} foto, dikirim setelah pesan ini"
+    else:
+        bukti_display = escape_html(data.get("bukti", "Tidak ada bukti foto"))
+    
+    # Buat message untuk admin dengan info kontak lengkap
+    message = (
+        f"🚨 <b>PENGADUAN BARU DITERIMA</b> 🚨\n\n"
+        f"🎫 <b>Ticket ID:</b> <code>{ticket_id}</code>\n"
+        f"🌐 <b>Website:</b> {website_escaped}\n"
+        f"⏰ <b>Waktu:</b> {timestamp} (WIB)\n\n"
+        f"<b>📋 DATA PELAPOR:</b>\n"
+        f"• <b>Nama Lengkap:</b> {nama_escaped}\n"
+        f"• <b>Username {website_escaped}:</b> {username_website_escaped}\n"
+        f"• <b>Nama Telegram:</b> {full_name_tg}\n"
+        f"• <b>Kontak Telegram:</b> {username_tg_escaped}\n"
+        f"• <b>Metode Kontak:</b> {contact_method}\n"
+        f"• <b>User ID:</b> <code>{user_id_escaped}</code>\n\n"
+        f"<b>📝 KELUHAN:</b>\n{keluhan_escaped}\n\n"
+        f"<b>📎 BUKTI:</b> {bukti_display}\n\n"
+        f"<b>📞 CARA HUBUNGI:</b>\n"
+    )
+    
+    # Tambahkan instruksi berdasarkan metode kontak
+    if "Username" in contact_method:
+        message += f"• Gunakan: <b>{username_tg_escaped}</b>\n"
+        message += f"• Atau User ID: <code>{user_id_escaped}</code>\n\n"
+    else:
+        message += f"• Gunakan User ID: <code>{user_id_escaped}</code>\n"
+        message += "• User tanpa username, gunakan ID untuk direct message\n\n"
+    
+    message += "⚠️ <b>Segera hubungi dan tindak lanjuti pengaduan ini!</b>"
+    
+    return message
 
 async def proses_cek_status(update: Update, context: ContextTypes.DEFAULT_TYPE, ticket_id: str, user_id: int):
     """Proses cek status tiket - TERPISAH DARI STATE PENGADUAN"""
     current_user_id = user_id
     
     try:
-        all_data = worksheet.get_all_records()
-        found = False
+        # Lookup dari storage lokal, tanpa akses jaringan
+        row = storage.get_ticket(ticket_id)
+        found = row is not None
         user_owns_ticket = False
         ticket_data = None
         
-        for row in all_data:
-            if row.get('Ticket ID') == ticket_id:
-                found = True
-                ticket_user_id = row.get('User_ID')
-                if str(ticket_user_id) == str(current_user_id):
-                    user_owns_ticket = True
-                    ticket_data = row
-                break
+        if found:
+            ticket_user_id = row.get('User_ID')
+            if str(ticket_user_id) == str(current_user_id):
+                user_owns_ticket = True
+                ticket_data = row
         
         if found and user_owns_ticket and ticket_data:
             status = ticket_data.get('Status', 'Tidak diketahui')
-            status_emoji = {
-                'Sedang diproses': '🟡',
-                'Selesai': '✅',
-                'Ditolak': '❌',
-                'Menunggu konfirmasi': '🟠'
-            }.get(status, '⚪')
+            status_emoji = STATUS_EMOJI.get(status, '⚪')
             
             nama_escaped = escape_html(ticket_data.get('Nama', 'Tidak ada'))
             username_escaped = escape_html(ticket_data.get('Username Website', 'Tidak ada'))
@@ -783,6 +1447,14 @@ async def proses_cek_status(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 parse_mode="HTML",
                 reply_markup=get_main_menu_keyboard()
             )
+        elif not readiness["initial_sync"]:
+            # Storage lokal belum lengkap sebelum sync awal: jangan jawab "tidak ditemukan"
+            await update.message.reply_text(
+                "⏳ <b>Sistem sedang sinkronisasi data tiket.</b>\n\n"
+                "Silakan cek status kembali dalam beberapa saat.",
+                parse_mode="HTML",
+                reply_markup=get_main_menu_keyboard()
+            )
         else:
             await update.message.reply_text(
                 "❌ <b>Tiket tidak ditemukan.</b>\n\n"
@@ -796,7 +1468,7 @@ async def proses_cek_status(update: Update, context: ContextTypes.DEFAULT_TYPE,
             )
             
     except Exception as e:
-        logger.error(f"Error checking status: {e}")
+        logger.error("Error checking status: %s", e)
         await update.message.reply_text(
             "❌ Terjadi error. Silakan coba lagi.\n\nSilakan pilih menu:",
             parse_mode="HTML",
@@ -804,7 +1476,7 @@ async def proses_cek_status(update: Update, context: ContextTypes.DEFAULT_TYPE,
         )
     
     async with get_user_lock(current_user_id):
-        clear_user_state(current_user_id)
+        await clear_user_state(current_user_id)
 
 async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Tampilkan menu utama"""
@@ -816,21 +1488,115 @@ async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=get_main_menu_keyboard()
     )
 
+def is_admin(user_id):
+    """Cek apakah user termasuk ADMIN_IDS"""
+    return user_id in ADMIN_IDS
+
+async def outbox_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Command admin: kedalaman outbox notifikasi dan lag pengiriman"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    stats = notification_outbox.stats()
+    await update.message.reply_text(
+        "📬 <b>OUTBOX NOTIFIKASI</b>\n\n"
+        f"• <b>Pending:</b> {stats['pending']}\n"
+        f"• <b>Gagal:</b> {stats['failed']}\n"
+        f"• <b>Pending tertua:</b> {stats['oldest_pending_age']:.0f} detik\n"
+        f"• <b>Rata-rata lag kirim:</b> {stats['avg_delivery_lag']:.1f} detik",
+        parse_mode="HTML"
+    )
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Command admin: rekap tiket dari agregat storage (tanpa scan sheet)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    stats = storage.stats(datetime.now(JAKARTA_TZ).date())
+    lines = [
+        "📊 <b>STATISTIK PENGADUAN</b>\n",
+        f"• <b>Total tiket:</b> {stats['total']}",
+        f"• <b>Tiket open:</b> {stats['open']}",
+        "\n<b>Per website:</b>"
+    ]
+    lines += [f"• {escape_html(name)}: {count}" for name, count in stats["websites"]]
+    lines.append("\n<b>Per status:</b>")
+    lines += [f"• {escape_html(status)}: {count}" for status, count in stats["statuses"]]
+    lines.append("\n<b>Per hari (terbaru):</b>")
+    lines += [
+        f"• {day[8:10]}/{day[5:7]}/{day[0:4]}: {count}" for day, count in stats["days"]
+    ]
+    lines.append("\n<b>Umur tiket open:</b>")
+    lines += [f"• {escape_html(label)}: {count}" for label, count in stats["aging"].items()]
+    oldest = stats["oldest_open_day"]
+    if oldest:
+        lines.append(f"• <b>Tertua:</b> {oldest[8:10]}/{oldest[5:7]}/{oldest[0:4]}")
+    
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Command admin: ringkasan metrik (format lengkap di endpoint /metrics)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    lines = ["📈 <b>METRIK BOT</b>\n", "<b>Handler (jumlah, rata-rata):</b>"]
+    for (handler,) in metrics.HANDLER_LATENCY.labels():
+        count, avg = metrics.HANDLER_LATENCY.summary(handler)
+        lines.append(f"• {handler}: {count}x, {avg * 1000:.0f} ms")
+    
+    lines.append("\n<b>Google Sheets (jumlah, rata-rata):</b>")
+    for (method,) in metrics.SHEETS_DURATION.labels():
+        count, avg = metrics.SHEETS_DURATION.summary(method)
+        errors = count - metrics.SHEETS_CALLS.value(method, "ok")
+        lines.append(f"• {method}: {count}x, {avg * 1000:.0f} ms, {errors} gagal")
+    
+    lines.append(f"• circuit: {sheets.circuit_state}")
+    lines.append(f"• siap: {', '.join(f'{name}={done}' for name, done in readiness.items())}")
+    for kind, value in sheets.quota_usage().items():
+        lines.append(f"• {kind}: {value}")
+    
+    lines.append("\n<b>Notifikasi:</b>")
+    for result in ("sent", "failed", "permanent"):
+        lines.append(f"• {result}: {metrics.NOTIFICATIONS.value(result)}")
+    
+    lines.append("\n<b>Session:</b>")
+    for kind, value in session_gauge().items():
+        lines.append(f"• {kind}: {value}")
+    
+    lines.append("\n<b>Antrian:</b>")
+    for queue, depth in queue_depth_gauge().items():
+        lines.append(f"• {queue}: {depth}")
+    
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel command"""
     await handle_cancel(update, context)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle error"""
-    logger.error(f"Error: {context.error}")
+    logger.error("Error: %s", context.error)
     if update and update.message:
         await update.message.reply_text(
             "❌ Terjadi error, silakan coba lagi.\n\nSilakan pilih menu:",
             reply_markup=get_main_menu_keyboard()
         )
 
+# Paralel antar user, berurutan per user
+update_processor = PerUserUpdateProcessor(
+    max_concurrent_updates=UPDATE_CONCURRENCY,
+    max_queue_per_user=UPDATE_USER_QUEUE_DEPTH
+)
+
 def main():
     """Main function"""
+    setup_logging(
+        level=LOG_LEVEL,
+        json_output=LOG_FORMAT == "json",
+        sample_rates=LOG_SAMPLE_RATES,
+        queue_size=LOG_QUEUE_SIZE
+    )
+    
     if not BOT_TOKEN:
         logger.error("BOT_TOKEN not found!")
         return
@@ -839,32 +1605,60 @@ def main():
         logger.error("GOOGLE_CREDENTIALS not found!")
         return
 
-    if not worksheet:
-        logger.error("Google Sheets not connected!")
+    if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+        logger.error("WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode!")
         return
 
     try:
-        application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+        builder = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .concurrent_updates(update_processor)
+        )
+        if TELEGRAM_API_BASE_URL:
+            builder = (
+                builder
+                .base_url(f"{TELEGRAM_API_BASE_URL}/bot")
+                .base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
+            )
+        application = builder.build()
         
-        # Command handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("cancel", cancel_command))
-        application.add_handler(CommandHandler("help", handle_bantuan))
-        application.add_handler(CommandHandler("buat_pengaduan", handle_buat_pengaduan))
-        application.add_handler(CommandHandler("cek_status", handle_cek_status))
-        application.add_handler(CommandHandler("bantuan", handle_bantuan))
+        # Command handlers: ikut flood control seperti pesan biasa (admin tidak dibatasi)
+        application.add_handler(CommandHandler("start", instrumented(flood_controlled(start))))
+        application.add_handler(CommandHandler("cancel", instrumented(flood_controlled(cancel_command))))
+        application.add_handler(CommandHandler("help", instrumented(flood_controlled(handle_bantuan))))
+        application.add_handler(CommandHandler("buat_pengaduan", instrumented(flood_controlled(handle_buat_pengaduan))))
+        application.add_handler(CommandHandler("cek_status", instrumented(flood_controlled(handle_cek_status))))
+        application.add_handler(CommandHandler("bantuan", instrumented(flood_controlled(handle_bantuan))))
+        application.add_handler(CommandHandler("outbox", flood_controlled(outbox_command)))
+        application.add_handler(CommandHandler("stats", flood_controlled(stats_command)))
+        application.add_handler(CommandHandler("metrics", flood_controlled(metrics_command)))
         
         # Message handlers
-        application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        application.add_handler(MessageHandler(filters.PHOTO, instrumented(flood_controlled(handle_photo))))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented(flood_controlled(handle_message))))
         
         application.add_error_handler(error_handler)
         
-        logger.info("✅ Enhanced Complaint Bot with Contact Info starting...")
-        application.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=Update.ALL_TYPES
-        )
+        logger.info(f"✅ Enhanced Complaint Bot with Contact Info starting ({BOT_MODE})...")
+        if BOT_MODE == "webhook":
+            # Server HTTP embedded; request tanpa secret token yang benar ditolak
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                drop_pending_updates=DROP_PENDING_UPDATES,
+                allowed_updates=ALLOWED_UPDATES
+            )
+        else:
+            application.run_polling(
+                drop_pending_updates=DROP_PENDING_UPDATES,
+                allowed_updates=ALLOWED_UPDATES
+            )
         
     except Exception as e:
         logger.error(f"Fatal error: {e}")
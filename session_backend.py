@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from session_store import serialize_state, deserialize_state
+
+logger = logging.getLogger(__name__)
+
+# Perpanjang / lepas lease hanya jika masih dipegang instance ini
+_RENEW_LEASE = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('EXPIRE', KEYS[1], ARGV[2]) end return 0"
+_RELEASE_LEASE = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+
+def new_state():
+    """State default untuk user baru"""
+    return {
+        "mode": None,
+        "step": None,
+        "data": {},
+        "last_activity": datetime.now()
+    }
+
+
+class SessionBackend(ABC):
+    """Interface penyimpanan state percakapan dan lock per user"""
+
+    @abstractmethod
+    def lock(self, user_id):
+        """Async context manager yang mengunci state user"""
+
+    @abstractmethod
+    async def get(self, user_id):
+        ...
+
+    @abstractmethod
+    async def save(self, user_id, state):
+        ...
+
+    @abstractmethod
+    async def clear(self, user_id):
+        ...
+
+    async def sweep(self, ttl_seconds):
+        """Evict state idle; mengembalikan list (user_id, mode) yang di-evict"""
+        return []
+
+    @abstractmethod
+    async def stats(self):
+        ...
+
+    async def claim_instance(self, instance_id, ttl_seconds):
+        """Klaim / perpanjang lease tugas satu-worker; False jika dipegang worker lain"""
+        return True
+
+    async def release_instance(self, instance_id):
+        pass
+
+    async def close(self):
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    """State di dict in-memory (satu proses), dipersist lewat SessionStore"""
+
+    def __init__(self, store=None):
+        self.store = store
+        self.states = {}
+        self.locks = {}
+
+    def lock(self, user_id):
+        if user_id not in self.locks:
+            self.locks[user_id] = asyncio.Lock()
+        return self.locks[user_id]
+
+    async def get(self, user_id):
+        if user_id not in self.states:
+            # Lazy load dari disk saat pertama kali diakses
+            stored = self.store.load(user_id) if self.store else None
+            if stored is not None:
+                self.states[user_id] = stored
+            else:
+                self.states[user_id] = new_state()
+                if self.store:
+                    self.store.mark_dirty(user_id, self.states[user_id])
+        return self.states[user_id]
+
+    async def save(self, user_id, state):
+        self.states[user_id] = state
+        if self.store:
+            # Debounce: ditulis ke disk oleh SessionStore.run()
+            self.store.mark_dirty(user_id, state)
+
+    async def clear(self, user_id):
+        self.states.pop(user_id, None)
+        lock = self.locks.get(user_id)
+        if lock and not lock.locked():
+            del self.locks[user_id]
+        if self.store:
+            self.store.mark_deleted(user_id)
+
+    async def sweep(self, ttl_seconds):
+        now = datetime.now()
+        evicted = []
+        for user_id, state in list(self.states.items()):
+            idle = (now - state.get("last_activity", now)).total_seconds()
+            lock = self.locks.get(user_id)
+            if idle < ttl_seconds or (lock and lock.locked()):
+                continue
+            evicted.append((user_id, state.get("mode")))
+            await self.clear(user_id)
+
+        # Lock tanpa state (mis. user yang tidak pernah punya state)
+        for user_id, lock in list(self.locks.items()):
+            if user_id not in self.states and not lock.locked():
+                del self.locks[user_id]
+
+        if self.store:
+            self.store.purge_idle(ttl_seconds)
+        return evicted
+
+    async def stats(self):
+        return {"live_states": len(self.states), "live_locks": len(self.locks)}
+
+    async def close(self):
+        if self.store:
+            self.store.close()
+
+
+class RedisSessionBackend(SessionBackend):
+    """State di store Redis-compatible, bertahan saat restart dan deploy
+
+    Lock per user memakai lock terdistribusi Redis, dan state kedaluwarsa
+    lewat TTL key, jadi tidak perlu sweeper. Beberapa worker boleh memakai
+    Redis yang sama; tugas yang hanya boleh jalan di satu worker memegang
+    lease (claim_instance).
+    """
+
+    def __init__(self, client, ttl_seconds, prefix="pengaduan", lock_timeout=30, lock_wait=10):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+
+    def _state_key(self, user_id):
+        return f"{self.prefix}:state:{user_id}"
+
+    def lock(self, user_id):
+        return self.client.lock(
+            f"{self.prefix}:lock:{user_id}",
+            timeout=self.lock_timeout,
+            blocking_timeout=self.lock_wait
+        )
+
+    async def get(self, user_id):
+        raw = await self.client.get(self._state_key(user_id))
+        if raw is None:
+            return new_state()
+        try:
+            return deserialize_state(raw)
+        except Exception as e:
+            logger.error(f"❌ Corrupt session for user {user_id}: {e}")
+            return new_state()
+
+    async def save(self, user_id, state):
+        await self.client.set(self._state_key(user_id), serialize_state(state), ex=self.ttl_seconds)
+
+    async def clear(self, user_id):
+        await self.client.delete(self._state_key(user_id))
+
+    async def claim_instance(self, instance_id, ttl_seconds):
+        key = f"{self.prefix}:instance"
+        if await self.client.set(key, instance_id, nx=True, ex=ttl_seconds):
+            return True
+        return bool(await self.client.eval(_RENEW_LEASE, 1, key, instance_id, ttl_seconds))
+
+    async def release_instance(self, instance_id):
+        await self.client.eval(_RELEASE_LEASE, 1, f"{self.prefix}:instance", instance_id)
+
+    async def stats(self):
+        live = 0
+        async for _ in self.client.scan_iter(match=f"{self.prefix}:state:*", count=500):
+            live += 1
+        return {"live_states": live}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_redis_backend(url, ttl_seconds, **kwargs):
+    """Buat RedisSessionBackend; paket redis hanya dibutuhkan untuk backend ini"""
+    import redis.asyncio as redis
+
+    client = redis.from_url(url, decode_responses=True)
+    return RedisSessionBackend(client, ttl_seconds, **kwargs)
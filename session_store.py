@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_DELETED = object()
+
+
+def serialize_state(state):
+    """State user -> JSON ringkas"""
+    payload = dict(state)
+    last_activity = payload.get("last_activity")
+    if isinstance(last_activity, datetime):
+        payload["last_activity"] = last_activity.isoformat()
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def deserialize_state(raw):
+    state = json.loads(raw)
+    if state.get("last_activity"):
+        state["last_activity"] = datetime.fromisoformat(state["last_activity"])
+    else:
+        state["last_activity"] = datetime.now()
+    return state
+
+
+class SessionStore:
+    """Penyimpanan state percakapan di SQLite
+
+    State dimuat per user saat pertama kali diakses (lazy), dan perubahan
+    ditulis secara debounce: ditandai dirty lalu di-flush per interval
+    dalam satu transaksi.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " user_id INTEGER PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+        self._lock = threading.Lock()
+        self._dirty = {}
+
+    def load(self, user_id):
+        """Muat state user dari disk, None jika tidak ada"""
+        pending = self._dirty.get(user_id)
+        if pending is _DELETED:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if not row:
+            return None
+        try:
+            return deserialize_state(row[0])
+        except Exception as e:
+            logger.error(f"❌ Corrupt session for user {user_id}: {e}")
+            return None
+
+    def mark_dirty(self, user_id, state):
+        self._dirty[user_id] = state
+
+    def mark_deleted(self, user_id):
+        self._dirty[user_id] = _DELETED
+
+    def flush(self):
+        """Tulis semua perubahan tertunda dalam satu transaksi"""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        now = time.time()
+        upserts = []
+        deletes = []
+        for user_id, state in dirty.items():
+            if state is _DELETED:
+                deletes.append((user_id,))
+            else:
+                upserts.append((user_id, serialize_state(state), now))
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO sessions (user_id, state, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    upserts
+                )
+                self._conn.executemany("DELETE FROM sessions WHERE user_id = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # Kembalikan ke antrian, kecuali yang sudah diubah lagi
+                for user_id, state in dirty.items():
+                    self._dirty.setdefault(user_id, state)
+                raise
+        return len(dirty)
+
+    def purge_idle(self, max_age_seconds):
+        """Hapus session di disk yang tidak disentuh lebih dari max_age_seconds"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age_seconds,)
+            )
+        return cursor.rowcount
+
+    async def run(self, interval):
+        """Loop flush debounce"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Session flush failed: {e}")
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sheets_gateway import SheetsGateway
+from status_watcher import column_letter
+from ticket_counter import parse_ticket_id
+from ticket_index import SHEET_HEADERS
+
+logger = logging.getLogger(__name__)
+
+
+def month_key(day):
+    """DDMMYYYY -> YYYY-MM"""
+    return f"{day[4:8]}-{day[2:4]}"
+
+
+def previous_month(key):
+    year, month = int(key[:4]), int(key[5:7])
+    if month == 1:
+        return f"{year - 1}-12"
+    return f"{year}-{month - 1:02d}"
+
+
+class PartitionedSheetsGateway(SheetsGateway):
+    """Gateway dengan satu worksheet per bulan
+
+    Partisi tiket ditentukan dari tanggal DDMMYYYY di Ticket ID. Tiket
+    sebelum start_month (YYYY-MM) tetap di worksheet lama (legacy). Baca
+    penuh dan pantau status hanya menyentuh hot_months bulan terakhir,
+    jadi biaya scan mengikuti volume terbaru, bukan seluruh histori.
+    """
+
+    def __init__(self, worksheet, spreadsheet, start_month, hot_months=2,
+                 title_prefix="Tiket ", timezone=None, **kwargs):
+        super().__init__(worksheet, **kwargs)
+        self.spreadsheet = spreadsheet
+        self.start_month = start_month
+        self.hot_months = hot_months
+        self.title_prefix = title_prefix
+        self.timezone = timezone
+        self._worksheets = None  # judul -> worksheet, dimuat saat pertama dipakai
+        self._headerless = set()  # judul partisi baru yang header-nya belum tertulis
+        self._create_lock = asyncio.Lock()
+
+    def attach(self, worksheet, spreadsheet=None):
+        super().attach(worksheet)
+        self.spreadsheet = spreadsheet
+        self._worksheets = None
+
+    def partition_for(self, ticket_id):
+        parsed = parse_ticket_id(ticket_id)
+        if not parsed:
+            return None
+        key = month_key(parsed[1])
+        return key if key >= self.start_month else None
+
+    async def _load_worksheets(self):
+        if self._worksheets is None:
+            worksheets = await self.call("worksheets", target=self.spreadsheet)
+            self._worksheets = {worksheet.title: worksheet for worksheet in worksheets}
+        return self._worksheets
+
+    async def _partition_worksheet(self, key, create=False):
+        if key is None:
+            return self.worksheet
+        title = f"{self.title_prefix}{key}"
+        worksheets = await self._load_worksheets()
+        if (title in worksheets and title not in self._headerless) or not create:
+            return worksheets.get(title)
+        async with self._create_lock:
+            worksheets = await self._load_worksheets()
+            if title not in worksheets:
+                try:
+                    worksheet = await self.call(
+                        "add_worksheet", title=title, rows=1000, cols=len(SHEET_HEADERS),
+                        target=self.spreadsheet
+                    )
+                except Exception:
+                    # Worksheet bisa saja sudah dibuat walau response gagal: muat ulang daftar
+                    self._worksheets = None
+                    worksheets = await self._load_worksheets()
+                    if title not in worksheets:
+                        raise
+                    worksheet = worksheets[title]
+                worksheets[title] = worksheet
+                self._headerless.add(title)
+                logger.info(f"🗂️ Created sheet partition {title}")
+            if title in self._headerless:
+                await self._write_header(worksheets[title])
+                self._headerless.discard(title)
+        return worksheets[title]
+
+    async def _write_header(self, worksheet):
+        # Range tetap (bukan append), jadi aman diulang; baris data baru di-append setelah header ada
+        header_range = f"A1:{column_letter(len(SHEET_HEADERS))}1"
+        await self.call("update", header_range, [list(SHEET_HEADERS)], target=worksheet)
+
+    async def worksheet_for(self, ticket_id):
+        return await self._partition_worksheet(self.partition_for(ticket_id), create=True)
+
+    async def hot_worksheets(self):
+        key = month_key(datetime.now(self.timezone).strftime("%d%m%Y"))
+        keys = []
+        for _ in range(self.hot_months):
+            partition = key if key >= self.start_month else None
+            if partition not in keys:
+                keys.append(partition)
+            key = previous_month(key)
+        worksheets = []
+        for partition in keys:
+            worksheet = await self._partition_worksheet(partition)
+            if worksheet is not None:
+                worksheets.append(worksheet)
+        return worksheets
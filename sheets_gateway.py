@@ -0,0 +1,232 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsTimeoutError(Exception):
+    """Panggilan Google Sheets melewati batas waktu"""
+
+
+class SheetsUnavailableError(Exception):
+    """Circuit breaker terbuka: Google Sheets sedang dianggap down"""
+
+
+# Panggilan yang aman diulang / digabung (tidak mengubah isi sheet dua kali)
+READ_METHODS = {"get_all_records", "get_all_values", "batch_get", "worksheets"}
+IDEMPOTENT_METHODS = READ_METHODS | {"update_cell", "update"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_code(error):
+    """Status HTTP dari gspread APIError (None untuk error lain)"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+class SheetsGateway:
+    """Gateway async untuk worksheet gspread
+
+    Semua panggilan gspread (HTTP sinkron) dijalankan di thread pool
+    terbatas, sehingga satu request Sheets yang lambat tidak membekukan
+    event loop dan percakapan user lain.
+
+    Gateway juga menjaga kuota: request per menit dibatasi (read / write
+    dihitung terpisah, kelebihan menunggu giliran), error 429 / 5xx diulang
+    dengan exponential backoff + jitter, read identik yang berjalan
+    bersamaan digabung jadi satu request, dan circuit breaker menolak
+    panggilan dengan cepat setelah kegagalan beruntun.
+    """
+
+    def __init__(self, worksheet, max_concurrency=4, timeout=30.0, max_retries=4,
+                 backoff_base=1.0, backoff_max=32.0, breaker_threshold=5, breaker_cooldown=60.0,
+                 read_quota=60, write_quota=60):
+        self.worksheet = worksheet
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.quota = {"read": read_quota, "write": write_quota}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="sheets"
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}  # key read -> future yang sedang berjalan
+        self._windows = {"read": deque(), "write": deque()}  # waktu request dalam 60 detik terakhir
+        self._failures = 0
+        self._open_until = None
+        self.throttled_total = 0
+        self.retries_total = 0
+        self.coalesced_total = 0
+
+    async def call(self, method, *args, timeout=None, target=None, **kwargs):
+        """Jalankan <target>.<method>(...) di thread pool dengan timeout
+
+        target default-nya worksheet utama; bisa juga worksheet lain atau
+        spreadsheet-nya.
+        """
+        target = self.worksheet if target is None else target
+        if target is None:
+            raise SheetsUnavailableError("Google Sheets not connected")
+        if method not in READ_METHODS:
+            return await self._call_with_retry(method, target, args, kwargs, timeout)
+
+        key = (method, id(target), repr(args), repr(sorted(kwargs.items())))
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._call_with_retry(method, target, args, kwargs, timeout))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._read_done(key, done))
+        else:
+            self.coalesced_total += 1
+            metrics.SHEETS_COALESCED.inc(method)
+        return await asyncio.shield(future)
+
+    def _read_done(self, key, future):
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # Hindari warning jika semua pemanggil sudah batal
+
+    async def _call_with_retry(self, method, target, args, kwargs, timeout):
+        attempt = 0
+        while True:
+            self._check_circuit(method)
+            await self._acquire_quota("read" if method in READ_METHODS else "write")
+            try:
+                response = await self._call_once(method, target, args, kwargs, timeout)
+            except Exception as e:
+                status = _status_code(e)
+                if status == 429:
+                    self.throttled_total += 1
+                    metrics.SHEETS_THROTTLED.inc(method)
+                transient = status is None or status in RETRYABLE_STATUS
+                # Write hanya diulang untuk 429 (pasti belum diterapkan Google)
+                retryable = status == 429 or (method in IDEMPOTENT_METHODS and transient)
+                if not retryable or attempt >= self.max_retries:
+                    if transient:
+                        self._record_failure()
+                    raise
+                # Full jitter: tunggu acak 0..min(max, base * 2^attempt)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retries_total += 1
+                metrics.SHEETS_RETRIES.inc(method)
+                logger.warning(f"🔁 Sheets {method} failed ({status or type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            self._failures = 0
+            self._open_until = None
+            return response
+
+    async def _call_once(self, method, target, args, kwargs, timeout):
+        func = partial(getattr(target, method), *args, **kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            result = "error"
+            try:
+                response = await asyncio.wait_for(loop.run_in_executor(self._executor, func), timeout)
+                result = "ok"
+                return response
+            except asyncio.TimeoutError:
+                result = "timeout"
+                logger.error(f"⏱️ Sheets call {method} timed out after {timeout}s")
+                raise SheetsTimeoutError(f"{method} timed out after {timeout}s")
+            finally:
+                metrics.SHEETS_CALLS.inc(method, result)
+                metrics.SHEETS_DURATION.observe(time.perf_counter() - started, method)
+
+    def _check_circuit(self, method):
+        if self._open_until is None:
+            return
+        if time.monotonic() < self._open_until:
+            metrics.SHEETS_CALLS.inc(method, "rejected")
+            raise SheetsUnavailableError(f"Google Sheets circuit open, {method} rejected")
+        # Half-open: panggilan berikutnya jadi percobaan; gagal sekali langsung buka lagi
+        self._failures = self.breaker_threshold - 1
+        self._open_until = None
+
+    def _record_failure(self):
+        self._failures += 1
+        if self._failures >= self.breaker_threshold and self._open_until is None:
+            self._open_until = time.monotonic() + self.breaker_cooldown
+            logger.error(f"🚫 Sheets circuit opened for {self.breaker_cooldown:.0f}s after {self._failures} failures")
+
+    async def _acquire_quota(self, kind):
+        limit = self.quota[kind]
+        if not limit:
+            return
+        window = self._windows[kind]
+        while True:
+            now = time.monotonic()
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) < limit:
+                window.append(now)
+                return
+            await asyncio.sleep(60 - (now - window[0]))
+
+    @property
+    def circuit_state(self):
+        if self._open_until is not None and time.monotonic() < self._open_until:
+            return "open"
+        return "half_open" if self._open_until is not None else "closed"
+
+    def quota_usage(self):
+        """Request Sheets dalam 60 detik terakhir dan counter throttle / retry"""
+        now = time.monotonic()
+        usage = {
+            f"{kind}_last_minute": sum(1 for started in window if now - started < 60)
+            for kind, window in self._windows.items()
+        }
+        usage.update({
+            "throttled_total": self.throttled_total,
+            "retries_total": self.retries_total,
+            "coalesced_total": self.coalesced_total,
+        })
+        return usage
+
+    def attach(self, worksheet, spreadsheet=None):
+        """Pasang worksheet setelah koneksi (lazy) ke Google Sheets berhasil"""
+        self.worksheet = worksheet
+
+    def partition_for(self, ticket_id):
+        """Kunci partisi worksheet untuk tiket (None = worksheet utama)"""
+        return None
+
+    async def worksheet_for(self, ticket_id):
+        """Worksheet tempat baris tiket berada"""
+        return self.worksheet
+
+    async def hot_worksheets(self):
+        """Worksheet yang dibaca saat sync dan pantau status"""
+        return [self.worksheet]
+
+    async def get_all_records(self, **kwargs):
+        return await self.call("get_all_records", **kwargs)
+
+    async def append_row(self, values, **kwargs):
+        return await self.call("append_row", values, **kwargs)
+
+    async def append_rows(self, values, **kwargs):
+        return await self.call("append_rows", values, **kwargs)
+
+    async def batch_get(self, ranges, **kwargs):
+        return await self.call("batch_get", ranges, **kwargs)
+
+    async def update_cell(self, row, col, value, **kwargs):
+        return await self.call("update_cell", row, col, value, **kwargs)
+
+    def shutdown(self):
+        """Tutup thread pool tanpa menunggu panggilan yang masih jalan"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
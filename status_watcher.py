@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def column_letter(index):
+    """Nomor kolom (mulai 1) -> huruf kolom A1 (1 -> A, 27 -> AA)"""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+class StatusWatcher:
+    """Pantau perubahan Status tiket di sheet tanpa download seluruh sheet
+
+    Setiap poll hanya membaca range kolom Ticket ID dan Status (satu
+    batch_get), lalu membandingkannya dengan status terakhir di storage
+    lokal. Tiket yang statusnya diubah admin diteruskan ke on_change.
+    """
+
+    def __init__(self, sheets, storage, ticket_index, on_change):
+        self.sheets = sheets
+        self.storage = storage
+        self.ticket_index = ticket_index
+        self.on_change = on_change
+
+    def ranges(self):
+        headers = self.ticket_index.headers
+        ticket_column = column_letter(headers.index("Ticket ID") + 1)
+        status_column = column_letter(headers.index("Status") + 1)
+        return [f"{ticket_column}2:{ticket_column}", f"{status_column}2:{status_column}"]
+
+    async def poll(self):
+        """Satu putaran: baca dua kolom, terapkan perubahan, panggil on_change"""
+        statuses = {}
+        for worksheet in await self.sheets.hot_worksheets():
+            ticket_values, status_values = await self.sheets.batch_get(self.ranges(), target=worksheet)
+            for offset, row in enumerate(ticket_values):
+                ticket_id = str(row[0]).strip() if row else ""
+                if not ticket_id:
+                    continue
+                self.ticket_index.set_row_number(ticket_id, offset + 2)
+                # Sel kosong di akhir kolom tidak dikembalikan oleh API
+                status_row = status_values[offset] if offset < len(status_values) else []
+                status = str(status_row[0]).strip() if status_row else ""
+                # Status kosong (belum diisi / sedang diedit admin) bukan perubahan
+                if status:
+                    statuses[ticket_id] = status
+
+        changed = self.storage.apply_sheet_statuses(statuses)
+        for ticket_id, old_status, new_status in changed:
+            try:
+                await self.on_change(ticket_id, old_status, new_status)
+            except Exception as e:
+                logger.error(f"❌ Status change handler failed for {ticket_id}: {e}")
+        return changed
+
+    async def run(self, interval):
+        """Loop background: poll setiap interval detik"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = await self.poll()
+                if changed:
+                    logger.info(f"🔔 {len(changed)} ticket status changes detected")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Status watch failed: {e}")
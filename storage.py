@@ -0,0 +1,467 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from status_watcher import column_letter
+from ticket_index import SHEET_HEADERS
+
+logger = logging.getLogger(__name__)
+
+# Header sheet -> kolom tabel tickets
+HEADER_COLUMNS = {
+    "Timestamp": "timestamp",
+    "Ticket ID": "ticket_id",
+    "Nama Website": "website_name",
+    "Nama": "nama",
+    "Username Website": "username_website",
+    "Keluhan": "keluhan",
+    "Bukti": "bukti",
+    "Username_TG": "username_tg",
+    "User_ID": "user_id",
+    "Contact Method": "contact_method",
+    "Full Name Telegram": "full_name_tg",
+    "Status": "status",
+}
+COLUMNS = [HEADER_COLUMNS[header] for header in SHEET_HEADERS]
+
+# Status yang dianggap tiket sudah ditutup (tidak masuk aging)
+CLOSED_STATUSES = ("Selesai", "Ditolak")
+# Batas umur tiket open (hari) untuk laporan aging
+AGING_BUCKETS = ((1, "< 1 hari"), (3, "1-3 hari"), (7, "3-7 hari"), (None, "> 7 hari"))
+
+# Tanggal YYYY-MM-DD dari bagian DDMMYYYY di Ticket ID (KODE-DDMMYYYY-NNN)
+_DAY_SQL = (
+    "substr(substr({t}.ticket_id, instr({t}.ticket_id, '-') + 1, 8), 5, 4) || '-' ||"
+    " substr(substr({t}.ticket_id, instr({t}.ticket_id, '-') + 1, 8), 3, 2) || '-' ||"
+    " substr(substr({t}.ticket_id, instr({t}.ticket_id, '-') + 1, 8), 1, 2)"
+)
+_CLOSED_SQL = ", ".join(f"'{status}'" for status in CLOSED_STATUSES)
+# Ukuran chunk WHERE ticket_id IN (...) (di bawah batas variabel SQLite)
+_IN_CHUNK = 500
+
+# Agregat ticket_stats dijaga trigger, jadi /stats tidak perlu scan tabel tickets
+_STATS_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO ticket_stats VALUES ('website', NEW.website_name, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+        INSERT INTO ticket_stats VALUES ('status', NEW.status, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+        INSERT INTO ticket_stats VALUES ('day', {_DAY_SQL.format(t='NEW')}, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+        INSERT INTO ticket_stats SELECT 'open_day', {_DAY_SQL.format(t='NEW')}, 1
+            WHERE NEW.status NOT IN ({_CLOSED_SQL})
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_status AFTER UPDATE OF status ON tickets
+    WHEN OLD.status IS NOT NEW.status BEGIN
+        UPDATE ticket_stats SET count = count - 1 WHERE dimension = 'status' AND key IS OLD.status;
+        INSERT INTO ticket_stats VALUES ('status', NEW.status, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+        UPDATE ticket_stats SET count = count - 1
+            WHERE dimension = 'open_day' AND key = {_DAY_SQL.format(t='OLD')}
+            AND OLD.status NOT IN ({_CLOSED_SQL}) AND NEW.status IN ({_CLOSED_SQL});
+        INSERT INTO ticket_stats SELECT 'open_day', {_DAY_SQL.format(t='NEW')}, 1
+            WHERE OLD.status IN ({_CLOSED_SQL}) AND NEW.status NOT IN ({_CLOSED_SQL})
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END""",
+]
+
+
+class TicketStorage(ABC):
+    """Interface penyimpanan tiket
+
+    Record tiket selalu berupa dict dengan key sesuai header sheet
+    ('Ticket ID', 'User_ID', 'Status', ...), sama seperti get_all_records().
+    """
+
+    @abstractmethod
+    def create_ticket(self, record):
+        ...
+
+    @abstractmethod
+    def get_ticket(self, ticket_id):
+        ...
+
+    @abstractmethod
+    def list_by_user(self, user_id, limit=None):
+        """Tiket milik user, terbaru dulu"""
+
+    @abstractmethod
+    def update_status(self, ticket_id, status):
+        """Ubah Status tiket; False jika tiket tidak ada atau status sama"""
+
+    @abstractmethod
+    def update_field(self, ticket_id, header, value):
+        """Ubah satu kolom tiket (nama header sheet, mis. 'Bukti')"""
+
+    @abstractmethod
+    def ticket_ids_for_day(self, day):
+        """Ticket ID dengan tanggal DDMMYYYY tertentu"""
+
+    @abstractmethod
+    def stats(self, today, days=7):
+        """Jumlah tiket per website, per status, per hari dan aging tiket open"""
+
+    @abstractmethod
+    def count_by_user_for_day(self, user_id, day):
+        """Jumlah tiket user dengan tanggal DDMMYYYY tertentu"""
+
+    @abstractmethod
+    def list_open(self):
+        """Semua tiket yang belum ditutup (status di luar CLOSED_STATUSES)"""
+
+
+class SQLiteTicketStorage(TicketStorage):
+    """Backend SQLite lokal, sumber data utama tiket"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{column} TEXT" for column in COLUMNS if column != "ticket_id")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS tickets ("
+            f" ticket_id TEXT PRIMARY KEY, {columns},"
+            f" created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_user ON tickets (user_id, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_website ON tickets (website_name)")
+        self._lock = threading.Lock()
+        self._init_stats()
+
+    def _init_stats(self):
+        has_stats = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticket_stats'"
+        ).fetchone()
+        self._conn.execute("BEGIN")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ticket_stats ("
+            " dimension TEXT NOT NULL, key TEXT, count INTEGER NOT NULL,"
+            " PRIMARY KEY (dimension, key))"
+        )
+        for trigger in _STATS_TRIGGERS:
+            self._conn.execute(trigger)
+        if not has_stats:
+            # Database lama: hitung agregat sekali dari tabel tickets
+            self._conn.execute(
+                "INSERT INTO ticket_stats SELECT 'website', website_name, COUNT(*) FROM tickets GROUP BY 2"
+            )
+            self._conn.execute(
+                "INSERT INTO ticket_stats SELECT 'status', status, COUNT(*) FROM tickets GROUP BY 2"
+            )
+            self._conn.execute(
+                f"INSERT INTO ticket_stats SELECT 'day', {_DAY_SQL.format(t='tickets')}, COUNT(*)"
+                f" FROM tickets GROUP BY 2"
+            )
+            self._conn.execute(
+                f"INSERT INTO ticket_stats SELECT 'open_day', {_DAY_SQL.format(t='tickets')}, COUNT(*)"
+                f" FROM tickets WHERE status NOT IN ({_CLOSED_SQL}) GROUP BY 2"
+            )
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_row(record):
+        return [str(record.get(header, "")) for header in SHEET_HEADERS]
+
+    @staticmethod
+    def _to_record(row):
+        return {header: row[HEADER_COLUMNS[header]] for header in SHEET_HEADERS}
+
+    def create_ticket(self, record):
+        now = time.time()
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO tickets ({', '.join(COLUMNS)}, created_at, updated_at)"
+                f" VALUES ({placeholders}, ?, ?)",
+                self._to_row(record) + [now, now]
+            )
+
+    def get_ticket(self, ticket_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM tickets WHERE ticket_id = ?", (str(ticket_id),)
+            ).fetchone()
+        return self._to_record(row) if row else None
+
+    def list_by_user(self, user_id, limit=None):
+        # Urut lewat idx_tickets_user (user_id, created_at, rowid), tanpa sort terpisah
+        query = "SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC, rowid DESC"
+        params = (str(user_id),)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def update_status(self, ticket_id, status):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tickets SET status = ?, updated_at = ? WHERE ticket_id = ? AND status IS NOT ?",
+                (status, time.time(), str(ticket_id), status)
+            )
+        return cursor.rowcount > 0
+
+    def update_field(self, ticket_id, header, value):
+        column = HEADER_COLUMNS[header]
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE tickets SET {column} = ?, updated_at = ? WHERE ticket_id = ?",
+                (str(value), time.time(), str(ticket_id))
+            )
+        return cursor.rowcount > 0
+
+    def ticket_ids_for_day(self, day):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ticket_id FROM tickets WHERE ticket_id LIKE ?", (f"%-{day}-%",)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_open(self):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tickets WHERE status NOT IN ({_CLOSED_SQL})"
+            ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def count_by_user_for_day(self, user_id, day):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM tickets WHERE user_id = ? AND ticket_id LIKE ?",
+                (str(user_id), f"%-{day}-%")
+            ).fetchone()
+        return row[0]
+
+    def stats(self, today, days=7):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dimension, key, count FROM ticket_stats WHERE count > 0"
+            ).fetchall()
+        grouped = {"website": {}, "status": {}, "day": {}, "open_day": {}}
+        for dimension, key, count in rows:
+            grouped[dimension][key if key is not None else ""] = count
+
+        aging = {label: 0 for _, label in AGING_BUCKETS}
+        for day, count in grouped["open_day"].items():
+            try:
+                age = (today - datetime.strptime(day, "%Y-%m-%d").date()).days
+            except ValueError:
+                continue
+            for limit, label in AGING_BUCKETS:
+                if limit is None or age < limit:
+                    aging[label] += count
+                    break
+
+        recent = sorted(grouped["day"].items(), reverse=True)[:days]
+        return {
+            "total": sum(grouped["status"].values()),
+            "open": sum(grouped["open_day"].values()),
+            "websites": sorted(grouped["website"].items(), key=lambda item: -item[1]),
+            "statuses": sorted(grouped["status"].items(), key=lambda item: -item[1]),
+            "days": recent,
+            "aging": aging,
+            "oldest_open_day": min(grouped["open_day"], default=None),
+        }
+
+    def _statuses_for(self, ticket_ids):
+        """Status lokal untuk ticket_ids saja (per chunk, tanpa scan seluruh histori)"""
+        ticket_ids = list(ticket_ids)
+        existing = {}
+        for start in range(0, len(ticket_ids), _IN_CHUNK):
+            chunk = ticket_ids[start:start + _IN_CHUNK]
+            existing.update(self._conn.execute(
+                f"SELECT ticket_id, status FROM tickets WHERE ticket_id IN ({', '.join('?' for _ in chunk)})",
+                chunk
+            ).fetchall())
+        return existing
+
+    def apply_sheet_statuses(self, statuses):
+        """Terapkan Status dari sheet (dict ticket_id -> status) ke tiket yang sudah ada
+
+        Mengembalikan list (ticket_id, status lama, status baru).
+        """
+        now = time.time()
+        with self._lock:
+            existing = self._statuses_for(statuses)
+            changed = [
+                (ticket_id, existing[ticket_id], status)
+                for ticket_id, status in statuses.items()
+                if ticket_id in existing and existing[ticket_id] != status
+            ]
+            if changed:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE tickets SET status = ?, updated_at = ? WHERE ticket_id = ?",
+                    [(status, now, ticket_id) for ticket_id, _, status in changed]
+                )
+                self._conn.execute("COMMIT")
+        return changed
+
+    def upsert_from_sheet(self, records):
+        """Sinkron dari sheet: tambah tiket yang belum ada, ambil Status terbaru
+
+        Mengembalikan list (ticket_id, status lama, status baru) untuk tiket
+        yang statusnya diubah di sheet.
+        """
+        now = time.time()
+        changed = []
+        with self._lock:
+            existing = self._statuses_for({
+                str(record.get("Ticket ID", "")).strip() for record in records
+            } - {""})
+            inserts = []
+            updates = []
+            for record in records:
+                ticket_id = str(record.get("Ticket ID", "")).strip()
+                if not ticket_id:
+                    continue
+                status = str(record.get("Status", "")).strip()
+                if ticket_id not in existing:
+                    inserts.append(self._to_row(record) + [now, now])
+                elif status and existing[ticket_id] != status:
+                    updates.append((status, now, ticket_id))
+                    changed.append((ticket_id, existing[ticket_id], status))
+
+            placeholders = ", ".join("?" for _ in COLUMNS)
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO tickets ({', '.join(COLUMNS)}, created_at, updated_at)"
+                f" VALUES ({placeholders}, ?, ?)",
+                inserts
+            )
+            self._conn.executemany(
+                "UPDATE tickets SET status = ?, updated_at = ? WHERE ticket_id = ?", updates
+            )
+            self._conn.execute("COMMIT")
+
+        if inserts or updates:
+            logger.info(f"🗄️ Storage synced from sheet: {len(inserts)} new, {len(updates)} status changes")
+        return changed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SheetMirror(TicketStorage):
+    """Storage yang membaca dari backend lokal dan mencerminkan tulisan ke sheet
+
+    Tiket baru masuk ke append queue (write-behind), dan pull() menarik
+    perubahan yang dibuat admin di sheet. Perubahan dari bot (update_status,
+    update_field_mirrored) ditulis ke storage lokal dulu, lalu ke sheet.
+    """
+
+    def __init__(self, primary, sheets, append_queue, ticket_index):
+        self.primary = primary
+        self.sheets = sheets
+        self.append_queue = append_queue
+        self.ticket_index = ticket_index
+        self._mirror_tasks = set()
+
+    def create_ticket(self, record):
+        self.primary.create_ticket(record)
+        values = [record.get(header, "") for header in SHEET_HEADERS]
+        self.append_queue.enqueue(record["Ticket ID"], values)
+        self.ticket_index.add(record["Ticket ID"])
+
+    def get_ticket(self, ticket_id):
+        return self.primary.get_ticket(ticket_id)
+
+    def list_by_user(self, user_id, limit=None):
+        return self.primary.list_by_user(user_id, limit)
+
+    def ticket_ids_for_day(self, day):
+        return self.primary.ticket_ids_for_day(day)
+
+    def stats(self, today, days=7):
+        return self.primary.stats(today, days)
+
+    def count_by_user_for_day(self, user_id, day):
+        return self.primary.count_by_user_for_day(user_id, day)
+
+    def list_open(self):
+        return self.primary.list_open()
+
+    def update_status(self, ticket_id, status):
+        """Ubah Status lokal; sel Status di sheet ditulis di background (butuh event loop)"""
+        if not self.primary.update_status(ticket_id, status):
+            return False
+        task = asyncio.get_running_loop().create_task(self._mirror_field(ticket_id, "Status", status))
+        self._mirror_tasks.add(task)
+        task.add_done_callback(self._mirror_tasks.discard)
+        return True
+
+    def update_field(self, ticket_id, header, value):
+        return self.primary.update_field(ticket_id, header, value)
+
+    async def update_field_mirrored(self, ticket_id, header, value):
+        """Ubah satu kolom tiket di storage lokal lalu di sheet
+
+        Baris yang masih di journal diubah di journal (ikut append); baris
+        yang sudah di sheet ditulis langsung ke selnya.
+        """
+        if not self.primary.update_field(ticket_id, header, value):
+            return False
+        await self._mirror_field(ticket_id, header, value)
+        return True
+
+    async def _mirror_field(self, ticket_id, header, value):
+        if await self.append_queue.update_pending(ticket_id, SHEET_HEADERS.index(header), value):
+            return
+        try:
+            worksheet = await self.sheets.worksheet_for(ticket_id)
+            row_number = await self._verified_row(ticket_id, worksheet)
+            if row_number is None:
+                logger.warning("⚠️ Row of %s not found in sheet, %s not mirrored", ticket_id, header)
+                return
+            column = self.ticket_index.headers.index(header) + 1
+            await self.sheets.update_cell(row_number, column, value, target=worksheet)
+        except Exception as e:
+            logger.error("❌ Failed to mirror %s of %s to sheet: %s", header, ticket_id, e)
+
+    async def _verified_row(self, ticket_id, worksheet):
+        """Nomor baris tiket yang sel Ticket ID-nya sudah dicek di sheet
+
+        Admin bisa sort / sisip / hapus baris setelah index dibangun, jadi
+        baris dari index dicek dulu; jika tidak cocok kolom Ticket ID dibaca ulang.
+        """
+        id_column = column_letter(self.ticket_index.headers.index("Ticket ID") + 1)
+        row_number = self.ticket_index.get_row_number(ticket_id)
+        if row_number is not None:
+            (cells,) = await self.sheets.batch_get([f"{id_column}{row_number}"], target=worksheet)
+            if cells and cells[0] and str(cells[0][0]).strip() == ticket_id:
+                return row_number
+        (cells,) = await self.sheets.batch_get([f"{id_column}2:{id_column}"], target=worksheet)
+        for position, cell in enumerate(cells):
+            if cell and str(cell[0]).strip() == ticket_id:
+                # Baris data mulai dari baris 2 (baris 1 header)
+                self.ticket_index.set_row_number(ticket_id, position + 2)
+                return position + 2
+        return None
+
+    def apply_sheet_statuses(self, statuses):
+        return self.primary.apply_sheet_statuses(statuses)
+
+    async def pull(self, fetch_started=None):
+        """Tarik worksheet aktif sekali: perbarui index baris dan storage lokal"""
+        partitions = [
+            await self.sheets.get_all_records(target=worksheet)
+            for worksheet in await self.sheets.hot_worksheets()
+        ]
+        self.ticket_index.load_partitions(partitions, fetch_started=fetch_started)
+        # Baris yang masih antri di journal belum ada di sheet
+        for _, ticket_id, _ in self.append_queue.journal.pending():
+            self.ticket_index.add(ticket_id)
+        return self.primary.upsert_from_sheet([record for records in partitions for record in records])
@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+from session_backend import MemorySessionBackend, RedisSessionBackend
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis butuh lupa untuk EVAL/EVALSHA (lock, lease)
+    from redis.exceptions import LockError
+except ImportError:  # pragma: no cover - paket opsional
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] not installed")
+class RedisSessionBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.backend = RedisSessionBackend(self.client, ttl_seconds=60, lock_timeout=5, lock_wait=0.2)
+
+    async def asyncTearDown(self):
+        await self.backend.close()
+
+    async def test_get_missing_returns_new_state(self):
+        state = await self.backend.get(1)
+        self.assertIsNone(state["mode"])
+        self.assertEqual(state["data"], {})
+
+    async def test_save_and_get_roundtrip(self):
+        last_activity = datetime(2024, 1, 1, 10, 30)
+        await self.backend.save(1, {
+            "mode": "pengaduan", "step": "keluhan", "data": {"nama": "Budi"}, "last_activity": last_activity
+        })
+        state = await self.backend.get(1)
+        self.assertEqual(state["step"], "keluhan")
+        self.assertEqual(state["data"], {"nama": "Budi"})
+        self.assertEqual(state["last_activity"], last_activity)
+        self.assertEqual((await self.backend.stats())["live_states"], 1)
+
+    async def test_save_sets_ttl(self):
+        await self.backend.save(1, {"mode": "pengaduan", "step": None, "data": {}})
+        ttl = await self.client.ttl("pengaduan:state:1")
+        self.assertTrue(0 < ttl <= 60)
+
+    async def test_state_expires_after_ttl(self):
+        backend = RedisSessionBackend(self.client, ttl_seconds=1)
+        await backend.save(1, {"mode": "pengaduan", "step": None, "data": {}})
+        await asyncio.sleep(1.1)
+        self.assertIsNone((await backend.get(1))["mode"])
+
+    async def test_clear(self):
+        await self.backend.save(1, {"mode": "cek_status", "step": "input_tiket", "data": {}})
+        await self.backend.clear(1)
+        self.assertIsNone((await self.backend.get(1))["mode"])
+
+    async def test_corrupt_state_returns_new_state(self):
+        await self.client.set("pengaduan:state:1", "{bukan json")
+        self.assertIsNone((await self.backend.get(1))["mode"])
+
+    async def test_lock_is_exclusive_per_user(self):
+        async with self.backend.lock(1):
+            with self.assertRaises(LockError):
+                async with self.backend.lock(1):
+                    pass
+            # User lain tidak ikut terkunci
+            async with self.backend.lock(2):
+                pass
+
+    async def test_lock_serializes_updates(self):
+        await self.backend.save(1, {"mode": None, "step": None, "data": {"count": 0}})
+        backend = RedisSessionBackend(self.client, ttl_seconds=60, lock_wait=5)
+
+        async def increment():
+            async with backend.lock(1):
+                state = await backend.get(1)
+                await asyncio.sleep(0.01)
+                state["data"]["count"] += 1
+                await backend.save(1, state)
+
+        await asyncio.gather(*[increment() for _ in range(5)])
+        self.assertEqual((await backend.get(1))["data"]["count"], 5)
+
+    async def test_instance_lease(self):
+        self.assertTrue(await self.backend.claim_instance("a", 30))
+        self.assertFalse(await self.backend.claim_instance("b", 30))
+        # Pemegang lease bisa memperpanjang
+        self.assertTrue(await self.backend.claim_instance("a", 30))
+        # Hanya pemegang lease yang bisa melepas
+        await self.backend.release_instance("b")
+        self.assertFalse(await self.backend.claim_instance("b", 30))
+        await self.backend.release_instance("a")
+        self.assertTrue(await self.backend.claim_instance("b", 30))
+
+
+class MemorySessionBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def test_get_save_clear(self):
+        backend = MemorySessionBackend()
+        state = await backend.get(1)
+        state["mode"] = "pengaduan"
+        await backend.save(1, state)
+        self.assertEqual((await backend.get(1))["mode"], "pengaduan")
+        await backend.clear(1)
+        self.assertIsNone((await backend.get(1))["mode"])
+
+    async def test_lock_is_shared_per_user(self):
+        backend = MemorySessionBackend()
+        self.assertIs(backend.lock(1), backend.lock(1))
+        self.assertIsNot(backend.lock(1), backend.lock(2))
+        self.assertTrue(await backend.claim_instance("a", 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
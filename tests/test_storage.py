@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from storage import SQLiteTicketStorage
+
+TODAY = date(2026, 10, 17)
+
+
+def record(ticket_id, website="JokerBola", user_id="7", status="Sedang diproses"):
+    return {"Ticket ID": ticket_id, "Nama Website": website, "User_ID": user_id, "Status": status}
+
+
+class TicketStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "tickets.db")
+        self.storage = SQLiteTicketStorage(self.path)
+
+    def tearDown(self):
+        self.storage.close()
+
+    def test_insert_close_reopen(self):
+        self.storage.create_ticket(record("JB-17102026-001"))
+        self.storage.create_ticket(record("JB-15102026-001"))
+        self.storage.create_ticket(record("NB-01102026-001", website="NagaBola"))
+        stats = self.storage.stats(TODAY)
+        self.assertEqual((stats["total"], stats["open"]), (3, 3))
+        self.assertEqual(stats["websites"], [("JokerBola", 2), ("NagaBola", 1)])
+        self.assertEqual(stats["aging"], {"< 1 hari": 1, "1-3 hari": 1, "3-7 hari": 0, "> 7 hari": 1})
+        self.assertEqual(stats["oldest_open_day"], "2026-10-01")
+
+        # Ditutup admin: keluar dari open / aging, total tetap
+        self.assertTrue(self.storage.update_status("NB-01102026-001", "Selesai"))
+        stats = self.storage.stats(TODAY)
+        self.assertEqual((stats["total"], stats["open"]), (3, 2))
+        self.assertEqual(dict(stats["statuses"]), {"Sedang diproses": 2, "Selesai": 1})
+        self.assertEqual(stats["aging"]["> 7 hari"], 0)
+        self.assertEqual(stats["oldest_open_day"], "2026-10-15")
+
+        # Status sama tidak mengubah agregat
+        self.assertFalse(self.storage.update_status("NB-01102026-001", "Selesai"))
+
+        # Dibuka lagi lewat sync status dari sheet
+        changed = self.storage.apply_sheet_statuses({"NB-01102026-001": "Menunggu konfirmasi"})
+        self.assertEqual(changed, [("NB-01102026-001", "Selesai", "Menunggu konfirmasi")])
+        stats = self.storage.stats(TODAY)
+        self.assertEqual((stats["total"], stats["open"]), (3, 3))
+        self.assertEqual(dict(stats["statuses"]), {"Sedang diproses": 2, "Menunggu konfirmasi": 1})
+        self.assertEqual(stats["aging"]["> 7 hari"], 1)
+        self.assertEqual(stats["days"], [("2026-10-17", 1), ("2026-10-15", 1), ("2026-10-01", 1)])
+
+    def test_existing_database_is_backfilled(self):
+        self.storage.create_ticket(record("JB-17102026-001"))
+        self.storage.create_ticket(record("JB-17102026-002", status="Ditolak"))
+        self.storage.close()
+        # Database dari versi sebelum ticket_stats ada
+        conn = sqlite3.connect(self.path)
+        conn.executescript(
+            "DROP TRIGGER trg_stats_insert; DROP TRIGGER trg_stats_status; DROP TABLE ticket_stats;"
+        )
+        conn.close()
+
+        self.storage = SQLiteTicketStorage(self.path)
+        stats = self.storage.stats(TODAY)
+        self.assertEqual((stats["total"], stats["open"]), (2, 1))
+        self.assertEqual(dict(stats["statuses"]), {"Sedang diproses": 1, "Ditolak": 1})
+
+
+class ListByUserTest(unittest.TestCase):
+    def test_newest_first_with_limit(self):
+        storage = SQLiteTicketStorage(os.path.join(tempfile.mkdtemp(), "tickets.db"))
+        for number in range(1, 4):
+            storage.create_ticket(record(f"JB-17102026-00{number}"))
+        storage.create_ticket(record("JB-17102026-004", user_id="8"))
+        tickets = [ticket["Ticket ID"] for ticket in storage.list_by_user(7, limit=2)]
+        self.assertEqual(tickets, ["JB-17102026-003", "JB-17102026-002"])
+        storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
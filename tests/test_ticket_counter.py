@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from ticket_counter import TicketCounter, RedisTicketCounter, parse_ticket_id
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis butuh lupa untuk EVAL
+except ImportError:  # pragma: no cover - paket opsional
+    fakeredis = None
+
+
+class ParseTicketIdTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_ticket_id("JB-01012026-007"), ("JB", "01012026", 7))
+        self.assertIsNone(parse_ticket_id("bukan tiket"))
+
+
+class TicketCounterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_seed_then_next_number_persists(self):
+        path = os.path.join(tempfile.mkdtemp(), "counter.json")
+        counter = TicketCounter(path)
+        await counter.seed(["JB-01012026-004", "JB-01012026-002", "NB-31122025-009"], "01012026")
+        self.assertTrue(counter.seeded)
+        self.assertEqual(await counter.next_number("JB", "01012026"), 5)
+        self.assertEqual(await counter.next_number("NB", "01012026"), 1)
+        # Restart: nomor yang sudah keluar tidak dipakai ulang
+        self.assertEqual(await TicketCounter(path).next_number("JB", "01012026"), 6)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] not installed")
+class RedisTicketCounterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_workers_share_the_counter(self):
+        first, second = RedisTicketCounter(self.client), RedisTicketCounter(self.client)
+        await first.seed(["JB-01012026-003"], "01012026")
+        self.assertFalse(second.seeded)
+        numbers = [
+            await first.next_number("JB", "01012026"),
+            await second.next_number("JB", "01012026"),
+            await first.next_number("JB", "01012026"),
+        ]
+        self.assertEqual(numbers, [4, 5, 6])
+        self.assertGreater(await self.client.ttl("pengaduan:ticket:JB:01012026"), 0)
+
+    async def test_seed_never_lowers_the_counter(self):
+        counter = RedisTicketCounter(self.client)
+        for _ in range(3):
+            await counter.next_number("JB", "01012026")
+        # Sheet belum memuat tiket yang baru keluar
+        await counter.seed(["JB-01012026-001"], "01012026")
+        self.assertEqual(await counter.next_number("JB", "01012026"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
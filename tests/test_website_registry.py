@@ -0,0 +1,59 @@
+import unittest
+
+from website_registry import WebsiteRegistry, edit_distance, normalize
+
+WEBSITES = {
+    "jokerbola": {"code": "JB", "name": "JokerBola"},
+    "nagabola": {"code": "NB", "name": "NagaBola"},
+    "macanbola": {"code": "MB", "name": "MacanBola"},
+    "ligapedia": {"code": "LP", "name": "LigaPedia"},
+    "pasarliga": {"code": "PL", "name": "PasarLiga", "aliases": ["pasar liga 88"]},
+}
+
+
+class WebsiteRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = WebsiteRegistry(WEBSITES)
+
+    def assertMatches(self, user_input, code):
+        result = self.registry.match(user_input)
+        self.assertEqual((result.status, result.code), ("ok", code), user_input)
+
+    def test_short_and_noise_input_matches_nothing(self):
+        # Dulu "a" cocok dengan website pertama
+        for user_input in ["", "a", "di", "www", "www.com", "bola", "xyz", "123"]:
+            self.assertEqual(self.registry.match(user_input).status, "none", user_input)
+
+    def test_codes(self):
+        self.assertMatches("JB", "JB")
+        self.assertMatches(" nb ", "NB")
+        self.assertMatches("lp", "LP")
+
+    def test_names_aliases_and_noise_words(self):
+        self.assertMatches("jokerbola", "JB")
+        self.assertMatches("Jokerbola!!", "JB")
+        self.assertMatches("www.NagaBola.com", "NB")
+        self.assertMatches("situs joker bola", "JB")
+        self.assertMatches("pasar liga 88", "PL")
+        self.assertMatches("naga", "NB")
+
+    def test_typos(self):
+        self.assertMatches("jokrebola", "JB")
+        self.assertMatches("jokerbol", "JB")
+        self.assertMatches("macanbla", "MB")
+        self.assertMatches("ligpedia", "LP")
+
+    def test_ambiguous_typo_returns_candidates(self):
+        result = self.registry.match("kaganbola")
+        self.assertEqual(result.status, "ambiguous")
+        self.assertIsNone(result.code)
+        self.assertEqual(result.candidates, ["MacanBola", "NagaBola"])
+
+    def test_helpers(self):
+        self.assertEqual(normalize("https://www.Joker-Bola.com"), "jokerbola")
+        self.assertEqual(edit_distance("jokrebola", "jokerbola", 2), 1)
+        self.assertEqual(edit_distance("abc", "xyzabc", 2), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import re
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_TICKET_PATTERN = re.compile(r"^([A-Z]+)-(\d{8})-(\d+)$")
+# SET key ke ARGV[1] hanya jika lebih besar dari nilai sekarang
+_SEED_MAX = (
+    "local current = tonumber(redis.call('GET', KEYS[1]) or '0') "
+    "if tonumber(ARGV[1]) > current then redis.call('SET', KEYS[1], ARGV[1]) end "
+    "return redis.call('EXPIRE', KEYS[1], ARGV[2])"
+)
+
+
+def parse_ticket_id(ticket_id):
+    """Pecah Ticket ID menjadi (kode website, DDMMYYYY, nomor) atau None"""
+    match = _TICKET_PATTERN.match(str(ticket_id).strip())
+    if not match:
+        return None
+    return match.group(1), match.group(2), int(match.group(3))
+
+
+class TicketCounter:
+    """Counter tiket harian per (kode website, tanggal Jakarta)
+
+    Nomor dibagikan dari memori secara atomik dan langsung disimpan ke
+    file JSON lokal, jadi restart tidak memakai ulang nomor yang sudah
+    keluar. Seed dari sheet cukup sekali saat startup. Hanya untuk satu
+    proses; beberapa worker memakai RedisTicketCounter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seeded = False
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            self._counts = {tuple(key.split("|", 1)): int(value) for key, value in stored.items()}
+            logger.info(f"🔢 Ticket counter loaded: {len(self._counts)} keys")
+        except Exception as e:
+            logger.error(f"❌ Failed to load ticket counter from {self.path}: {e}")
+
+    def _persist(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        stored = {f"{code}|{day}": value for (code, day), value in self._counts.items()}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def seed(self, ticket_ids, day):
+        """Naikkan counter hari ini sesuai Ticket ID yang sudah ada (ambil maksimum)"""
+        with self._lock:
+            changed = False
+            for ticket_id in ticket_ids:
+                parsed = parse_ticket_id(ticket_id)
+                if not parsed or parsed[1] != day:
+                    continue
+                code, _, number = parsed
+                if number > self._counts.get((code, day), 0):
+                    self._counts[(code, day)] = number
+                    changed = True
+            self.seeded = True
+            if changed:
+                self._persist()
+
+    async def next_number(self, website_code, day):
+        """Ambil nomor berikutnya untuk (kode website, DDMMYYYY)"""
+        with self._lock:
+            # Buang counter hari lain supaya file tetap kecil
+            for key in [key for key in self._counts if key[1] != day]:
+                del self._counts[key]
+            number = self._counts.get((website_code, day), 0) + 1
+            self._counts[(website_code, day)] = number
+            self._persist()
+            return number
+
+
+class RedisTicketCounter:
+    """Counter tiket harian di Redis (INCR), dipakai bersama oleh semua worker
+
+    Key per (kode website, tanggal) kedaluwarsa sendiri setelah beberapa
+    hari. seeded bersifat per proses: setiap worker menunggu sync awal
+    dari sheet sebelum membagikan nomor.
+    """
+
+    def __init__(self, client, prefix="pengaduan", ttl_seconds=3 * 24 * 60 * 60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.seeded = False
+
+    def _key(self, website_code, day):
+        return f"{self.prefix}:ticket:{website_code}:{day}"
+
+    async def seed(self, ticket_ids, day):
+        """Naikkan counter ke nomor tertinggi di sheet; nomor yang sudah keluar tidak turun"""
+        highest = {}
+        for ticket_id in ticket_ids:
+            parsed = parse_ticket_id(ticket_id)
+            if parsed and parsed[1] == day:
+                highest[parsed[0]] = max(highest.get(parsed[0], 0), parsed[2])
+        for code, number in highest.items():
+            await self.client.eval(_SEED_MAX, 1, self._key(code, day), number, self.ttl_seconds)
+        self.seeded = True
+
+    async def next_number(self, website_code, day):
+        """Ambil nomor berikutnya untuk (kode website, DDMMYYYY)"""
+        key = self._key(website_code, day)
+        async with self.client.pipeline(transaction=True) as pipe:
+            number, _ = await pipe.incr(key).expire(key, self.ttl_seconds).execute()
+        return number
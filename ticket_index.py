@@ -0,0 +1,101 @@
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Urutan kolom sesuai append_row di selesaikan_pengaduan
+SHEET_HEADERS = [
+    "Timestamp", "Ticket ID", "Nama Website", "Nama", "Username Website",
+    "Keluhan", "Bukti", "Username_TG", "User_ID", "Contact Method",
+    "Full Name Telegram", "Status"
+]
+
+_UPDATED_RANGE_ROW = re.compile(r"![A-Z]+(\d+)")
+
+
+def row_from_append_response(response):
+    """Ambil nomor baris pertama dari response append_row/append_rows (updates.updatedRange)"""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+    except (KeyError, TypeError):
+        return None
+    match = _UPDATED_RANGE_ROW.search(updated_range)
+    return int(match.group(1)) if match else None
+
+
+class TicketIndex:
+    """Index tiket in-memory: Ticket ID -> nomor baris di sheet
+
+    Data tiket ada di storage lokal; index ini hanya menyimpan posisi baris
+    (untuk menulis sel) dan urutan header sheet. Dibangun dari
+    get_all_records() saat sync, lalu diperbarui setiap kali bot sendiri
+    menambah baris.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._headers = list(SHEET_HEADERS)
+        self._local = {}  # ticket_id -> waktu ditambahkan (monotonic)
+        self.last_sync = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, ticket_id):
+        return str(ticket_id) in self._rows
+
+    @property
+    def headers(self):
+        return list(self._headers)
+
+    def load(self, records, fetch_started=None):
+        """Bangun ulang index dari hasil get_all_records()
+
+        fetch_started adalah waktu (monotonic) sebelum records diambil.
+        Tiket yang ditambahkan bot setelah waktu itu belum tentu ada di
+        records, jadi tetap dipertahankan.
+        """
+        self.load_partitions([records], fetch_started)
+
+    def load_partitions(self, partitions, fetch_started=None):
+        """Seperti load(), untuk beberapa worksheet sekaligus (nomor baris per worksheet)"""
+        rows = {}
+        for records in partitions:
+            for position, row in enumerate(records):
+                ticket_id = str(row.get("Ticket ID", "")).strip()
+                if ticket_id:
+                    # Baris 1 adalah header, data mulai dari baris 2
+                    rows[ticket_id] = position + 2
+            if records:
+                self._headers = list(records[0].keys())
+
+        if fetch_started is not None:
+            for ticket_id, added_at in list(self._local.items()):
+                if ticket_id in rows or added_at < fetch_started:
+                    del self._local[ticket_id]
+                elif ticket_id in self._rows:
+                    rows[ticket_id] = self._rows[ticket_id]
+        else:
+            self._local.clear()
+
+        self._rows = rows
+        self.last_sync = time.monotonic()
+        logger.info(f"📇 Ticket index loaded: {len(rows)} tickets")
+
+    def add(self, ticket_id, row_number=None):
+        """Tambahkan tiket yang baru saja di-append oleh bot"""
+        ticket_id = str(ticket_id).strip()
+        if not ticket_id:
+            return
+        self._rows[ticket_id] = row_number
+        self._local[ticket_id] = time.monotonic()
+
+    def set_row_number(self, ticket_id, row_number):
+        """Catat nomor baris setelah baris benar-benar masuk sheet"""
+        if str(ticket_id) in self._rows:
+            self._rows[str(ticket_id)] = row_number
+
+    def get_row_number(self, ticket_id):
+        """Nomor baris tiket di sheet (None jika belum diketahui)"""
+        return self._rows.get(str(ticket_id))
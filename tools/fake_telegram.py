@@ -0,0 +1,137 @@
+"""Server Telegram Bot API palsu untuk menguji mode webhook secara lokal
+
+Jalankan server ini, lalu jalankan bot dengan:
+
+    BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET=rahasia \\
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 python pengaduan_bot.py
+
+Setelah bot memanggil setWebhook, setiap baris yang diketik di stdin
+dikirim (POST) ke webhook bot sebagai update pesan dari --user-id.
+Pesan yang dikirim bot dicetak ke stdout.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+webhook = {"url": None, "secret_token": None}
+counters = {"update_id": 0, "message_id": 0}
+
+
+def _parse_params(handler):
+    length = int(handler.headers.get("Content-Length") or 0)
+    raw = handler.rfile.read(length).decode("utf-8") if length else ""
+    content_type = handler.headers.get("Content-Type", "")
+    if "application/json" in content_type:
+        return json.loads(raw or "{}")
+    params = {key: values[0] for key, values in parse_qs(raw).items()}
+    # PTB mengirim nilai non-string sebagai JSON
+    for key, value in params.items():
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            pass
+    return params
+
+
+def _next(name):
+    counters[name] += 1
+    return counters[name]
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        params = _parse_params(self)
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        elif method == "setWebhook":
+            webhook["url"] = params.get("url")
+            webhook["secret_token"] = params.get("secret_token")
+            print(f"🔗 Webhook set: {webhook['url']}")
+            result = True
+        elif method == "sendMessage":
+            print(f"🤖 -> {params.get('chat_id')}: {params.get('text')}\n")
+            result = {
+                "message_id": _next("message_id"),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id")), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        elif method == "getFile":
+            file_id = params.get("file_id", "")
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_path": f"photos/{file_id}.jpg"}
+        else:
+            result = True
+
+        body = json.dumps({"ok": True, "result": result}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def post_update(text, user_id, secret_override=None):
+    """Kirim satu update pesan text ke webhook bot"""
+    message = {
+        "message_id": _next("message_id"),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Tester", "username": "tester"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    update = {"update_id": _next("update_id"), "message": message}
+
+    request = urllib.request.Request(
+        webhook["url"],
+        data=json.dumps(update).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret_override or webhook["secret_token"] or "",
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--user-id", type=int, default=1000)
+    parser.add_argument("--secret-override", help="Kirim secret token lain untuk menguji penolakan")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🧪 Fake Telegram API listening on http://127.0.0.1:{args.port}")
+
+    for line in sys.stdin:
+        text = line.strip()
+        if not text:
+            continue
+        if not webhook["url"]:
+            print("⚠️ Bot belum memanggil setWebhook")
+            continue
+        status = post_update(text, args.user_id, args.secret_override)
+        print(f"📨 POST update -> HTTP {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Batas semaphore bawaan BaseUpdateProcessor. Semaphore itu diambil sebelum
+# do_process_update (process_update final), jadi update yang masih menunggu
+# giliran user ikut memegang slot; batas konkurensi sebenarnya dijaga sendiri.
+MAX_PENDING_UPDATES = 100_000
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update dari user berbeda diproses paralel, update satu user tetap berurutan
+
+    Urutan per user dijaga dengan asyncio.Lock per user (antrian FIFO).
+    Slot global (max_concurrent_updates) baru diambil setelah giliran user
+    didapat, jadi update yang antri di belakang update lain milik user yang
+    sama tidak memegang slot. Update yang melebihi max_queue_per_user dibuang.
+    """
+
+    def __init__(self, max_concurrent_updates=64, max_queue_per_user=20):
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates must be a positive integer")
+        super().__init__(MAX_PENDING_UPDATES)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self.max_queue_per_user = max_queue_per_user
+        self._user_locks = {}
+        self._user_pending = {}
+
+    @staticmethod
+    def _user_key(update):
+        user = getattr(update, "effective_user", None)
+        if user:
+            return user.id
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat else None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._user_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        pending = self._user_pending.get(key, 0)
+        if pending >= self.max_queue_per_user:
+            logger.warning("⚠️ Update queue full for user %s, dropping update", key)
+            coroutine.close()
+            return
+
+        self._user_pending[key] = pending + 1
+        lock = self._user_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock, self._slots:
+                await coroutine
+        finally:
+            self._user_pending[key] -= 1
+            if self._user_pending[key] == 0:
+                del self._user_pending[key]
+                self._user_locks.pop(key, None)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def queue_depth(self):
+        """Total update yang sedang menunggu atau diproses"""
+        return sum(self._user_pending.values())
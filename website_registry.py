@@ -0,0 +1,157 @@
+import re
+import json
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Kata yang diabaikan saat normalisasi input (mis. "www.jokerbola.com")
+NOISE_TOKENS = {"www", "http", "https", "com", "net", "org", "id", "co", "situs", "website", "web", "di"}
+# Panjang minimum input untuk pencocokan alias dan fuzzy
+MIN_MATCH_LENGTH = 3
+# Panjang minimum awalan nama (mis. "naga" untuk NagaBola)
+MIN_PREFIX_LENGTH = 4
+
+WebsiteMatch = namedtuple("WebsiteMatch", ["status", "name", "code", "candidates"])
+
+
+def _tokens(text):
+    return [token for token in re.findall(r"[a-z0-9]+", str(text).lower()) if token not in NOISE_TOKENS]
+
+
+def normalize(text):
+    """Lowercase, buang tanda baca/spasi dan kata noise"""
+    return "".join(_tokens(text))
+
+
+def _deletes(word, max_distance):
+    """Semua variasi word dengan menghapus hingga max_distance karakter"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        results |= frontier
+    return results
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment), berhenti jika > limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class WebsiteRegistry:
+    """Index alias website untuk validasi input nama website
+
+    Dibangun sekali saat startup: alias ternormalisasi (key, nama, kode,
+    alias tambahan) -> kode website untuk lookup O(1), plus index
+    deletion (gaya SymSpell) untuk toleransi typo tanpa scan linear.
+    """
+
+    def __init__(self, websites, max_distance=2):
+        self.max_distance = max_distance
+        self._websites = {}
+        self._aliases = {}
+        self._codes = {}
+        self._deletes = {}
+        self._prefixes = {}
+        for key, info in websites.items():
+            code = info["code"]
+            self._websites[code] = info["name"]
+            self._codes[code.lower()] = code
+            for alias in [key, info["name"], *info.get("aliases", [])]:
+                normalized = normalize(alias)
+                if len(normalized) < MIN_MATCH_LENGTH:
+                    continue
+                existing = self._aliases.get(normalized)
+                if existing and existing != code:
+                    logger.warning(f"⚠️ Alias '{alias}' dipakai oleh {existing} dan {code}")
+                self._aliases[normalized] = code
+        for alias, code in self._aliases.items():
+            for variant in _deletes(alias, max_distance):
+                self._deletes.setdefault(variant, set()).add(alias)
+            for length in range(MIN_PREFIX_LENGTH, len(alias)):
+                self._prefixes.setdefault(alias[:length], set()).add(code)
+
+    def __len__(self):
+        return len(self._websites)
+
+    def _result(self, codes):
+        codes = sorted(codes)
+        if len(codes) == 1:
+            code = codes[0]
+            return WebsiteMatch("ok", self._websites[code], code, [self._websites[code]])
+        return WebsiteMatch("ambiguous", None, None, [self._websites[code] for code in codes])
+
+    def _fuzzy(self, normalized):
+        limit = 1 if len(normalized) < 6 else self.max_distance
+        best = limit + 1
+        codes = set()
+        candidates = set()
+        for variant in _deletes(normalized, limit):
+            candidates |= self._deletes.get(variant, set())
+        for alias in candidates:
+            distance = edit_distance(normalized, alias, limit)
+            if distance < best:
+                best, codes = distance, {self._aliases[alias]}
+            elif distance == best:
+                codes.add(self._aliases[alias])
+        return codes
+
+    def match(self, user_input):
+        """Cocokkan input user ke website: status ok / ambiguous / none"""
+        raw = str(user_input).strip().lower()
+        if raw in self._codes:
+            return self._result({self._codes[raw]})
+
+        tokens = _tokens(user_input)
+        normalized = "".join(tokens)
+        if len(normalized) < MIN_MATCH_LENGTH:
+            return WebsiteMatch("none", None, None, [])
+
+        # 1. Exact: seluruh input, token / pasangan token dalam kalimat, lalu awalan
+        if normalized in self._aliases:
+            return self._result({self._aliases[normalized]})
+        phrases = tokens + ["".join(pair) for pair in zip(tokens, tokens[1:])]
+        codes = {self._aliases[phrase] for phrase in phrases if phrase in self._aliases}
+        if codes:
+            return self._result(codes)
+        if normalized in self._prefixes:
+            return self._result(self._prefixes[normalized])
+
+        # 2. Fuzzy dengan jarak edit terbatas
+        codes = self._fuzzy(normalized)
+        if not codes:
+            for phrase in phrases:
+                if len(phrase) >= MIN_MATCH_LENGTH + 2:
+                    codes |= self._fuzzy(phrase)
+        if codes:
+            return self._result(codes)
+        return WebsiteMatch("none", None, None, [])
+
+
+def load_websites(path, default):
+    """Baca konfigurasi website dari file JSON, fallback ke default"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            websites = json.load(f)
+        logger.info(f"🌐 Loaded {len(websites)} websites from {path}")
+        return websites
+    except FileNotFoundError:
+        return default
+    except Exception as e:
+        logger.error(f"❌ Failed to load websites from {path}: {e}")
+        return default